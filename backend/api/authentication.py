@@ -0,0 +1,108 @@
+import threading
+import time
+
+import jwt
+from django.conf import settings
+from django.utils.functional import cached_property
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import User
+from .ttlcache import TTLCache
+
+
+class TokenCache(TTLCache):
+    """
+    Already verified token -> claims, so polled endpoints don't redo the HMAC
+    check on every hit. Entries are dropped at the token's exp.
+    """
+
+    def now(self):
+        # exp is wall-clock time
+        return time.time()
+
+    def set(self, token, claims):
+        expires_at = claims.get("exp")
+        if expires_at is not None:
+            super().set(token, claims, expires_at - self.now())
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                _token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+    return _token_cache
+
+
+def decode_token(token):
+    """Verified claims of `token`; raises jwt.InvalidTokenError (or a subclass)."""
+    cache = get_token_cache()
+    claims = cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+        cache.set(token, claims)
+    return claims
+
+
+class TokenUser:
+    """
+    request.user for token-authenticated requests. id and email come from the
+    token; the User row is only loaded if a view asks for `instance`, and then
+    once per request.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, claims):
+        self.claims = claims
+        self.id = claims["user_id"]
+        self.email = claims.get("email")
+
+    @cached_property
+    def instance(self):
+        return User.objects.filter(id=self.id).first()
+
+    def __str__(self):
+        return self.email or self.id
+
+
+class JWTAuthentication(BaseAuthentication):
+    """Authorization: Bearer <token> as issued by POST /api/users/authenticate/."""
+
+    def authenticate(self, request):
+        header = get_authorization_header(request).split()
+        if not header or header[0].lower() != b"bearer":
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token.")
+
+        try:
+            claims = decode_token(header[1].decode())
+        except jwt.ExpiredSignatureError:
+            raise exceptions.AuthenticationFailed("Token expired.")
+        except (jwt.InvalidTokenError, UnicodeDecodeError):
+            raise exceptions.AuthenticationFailed("Invalid token.")
+
+        if "user_id" not in claims:
+            raise exceptions.AuthenticationFailed("Invalid token.")
+        return TokenUser(claims), claims
+
+    def authenticate_header(self, request):
+        return "Bearer"
+
+
+class JWTAuthenticationScheme(OpenApiAuthenticationExtension):
+    # describes JWTAuthentication in the /api/schema/ (Swagger) output
+    target_class = "api.authentication.JWTAuthentication"
+    name = "jwtAuth"
+
+    def get_security_definition(self, auto_schema):
+        return {"type": "http", "scheme": "bearer", "bearerFormat": "JWT"}
@@ -0,0 +1,61 @@
+import uuid
+
+from .models import Contact, User
+from .ttlcache import TTLCache
+
+# Type-ahead over User.email for adding contacts. Longer prefixes go straight
+# to the database, where a text_pattern_ops index on UPPER(email) (migration
+# 0015) serves email__istartswith on PostgreSQL. One- and two-letter prefixes
+# match too many users to sort per keystroke, so the first emails for each of
+# them are kept in memory for a short while and filtered per caller.
+
+HOT_PREFIX_LENGTH = 2
+HOT_PREFIX_CANDIDATES = 200
+HOT_PREFIX_TTL = 60
+HOT_PREFIX_CACHE_SIZE = 2000
+
+# prefix -> ([(user_id, email)] sorted by email, complete)
+hot_prefixes = TTLCache(HOT_PREFIX_CACHE_SIZE)
+
+
+def suggest(user_id, prefix, limit):
+    """Up to `limit` users whose email starts with `prefix` (any case), except the user and their contacts."""
+    user_id = uuid.UUID(str(user_id))
+    prefix = prefix.lower()
+    if len(prefix) <= HOT_PREFIX_LENGTH and limit <= HOT_PREFIX_CANDIDATES:
+        candidates, complete = _hot_candidates(prefix)
+        taken = set(Contact.objects.filter(
+            user_id=user_id, contact_id__in=[candidate_id for candidate_id, _ in candidates]
+        ).values_list("contact_id", flat=True))
+        taken.add(user_id)
+
+        results = [
+            {"id": candidate_id, "email": email}
+            for candidate_id, email in candidates
+            if candidate_id not in taken
+        ][:limit]
+        if len(results) == limit or complete:
+            return results
+
+    # one query, the caller's contacts are excluded by a subquery
+    return list(
+        User.objects
+        .filter(email__istartswith=prefix)
+        .exclude(id=user_id)
+        .exclude(id__in=Contact.objects.filter(user_id=user_id).values("contact_id"))
+        .order_by("email")
+        .values("id", "email")[:limit]
+    )
+
+
+def _hot_candidates(prefix):
+    cached = hot_prefixes.get(prefix)
+    if cached is None:
+        rows = list(
+            User.objects.filter(email__istartswith=prefix)
+            .order_by("email")
+            .values_list("id", "email")[:HOT_PREFIX_CANDIDATES + 1]
+        )
+        cached = (rows[:HOT_PREFIX_CANDIDATES], len(rows) <= HOT_PREFIX_CANDIDATES)
+        hot_prefixes.set(prefix, cached, HOT_PREFIX_TTL)
+    return cached
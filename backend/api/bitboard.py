@@ -0,0 +1,63 @@
+# 3x3 board packed into one integer: bits 0-8 are X's cells, bits 9-17 O's.
+# Bit i stands for field i + 1 (fields are numbered 1-9, row by row).
+
+EMPTY = "EMPTY"
+CELLS = 9
+FULL = (1 << CELLS) - 1
+SHIFTS = {"X": 0, "O": CELLS}
+
+WIN_LINES = (
+    (0, 1, 2), (3, 4, 5), (6, 7, 8),  # poziomo
+    (0, 3, 6), (1, 4, 7), (2, 5, 8),  # pionowo
+    (0, 4, 8), (2, 4, 6),             # na skos
+)
+WIN_MASKS = tuple(sum(1 << cell for cell in line) for line in WIN_LINES)
+
+
+def split(board):
+    """(X mask, O mask)"""
+    return board & FULL, (board >> CELLS) & FULL
+
+
+def symbol_at(board, field):
+    bit = 1 << (field - 1)
+    x, o = split(board)
+    if x & bit:
+        return "X"
+    if o & bit:
+        return "O"
+    return EMPTY
+
+
+def place(board, field, symbol):
+    return board | (1 << (field - 1 + SHIFTS[symbol]))
+
+
+def move_count(board):
+    return bin(board).count("1")
+
+
+def winner(board):
+    """"X", "O", "DRAW" or None while the game goes on."""
+    x, o = split(board)
+    for mask in WIN_MASKS:
+        if x & mask == mask:
+            return "X"
+        if o & mask == mask:
+            return "O"
+    if x | o == FULL:
+        return "DRAW"
+    return None
+
+
+def to_fields(board):
+    return {f"field_{field}": symbol_at(board, field) for field in range(1, CELLS + 1)}
+
+
+def from_fields(fields):
+    board = 0
+    for field in range(1, CELLS + 1):
+        symbol = fields[f"field_{field}"]
+        if symbol != EMPTY:
+            board = place(board, field, symbol)
+    return board
@@ -0,0 +1,68 @@
+import time
+
+from rest_framework.response import Response
+
+from . import realtime
+
+# Upper bound for ?wait= so parked requests don't outlive proxy timeouts.
+LONG_POLL_MAX_WAIT = 25
+
+
+def make_etag(*parts):
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def long_poll_timeout(request):
+    try:
+        wait = float(request.GET.get("wait", 0))
+    except ValueError:
+        return 0
+    return max(0, min(wait, LONG_POLL_MAX_WAIT))
+
+
+def not_modified(request, get_etag, channel=None, etag=None):
+    """
+    Conditional GET for the polled endpoints. `get_etag` returns the current
+    ETag (cheap version lookup, no serialization). Returns (etag, response):
+    response is a 304 if the client's If-None-Match is still current, else None
+    and the caller builds the full body.
+
+    With ?wait=<seconds> and a `channel`, an unchanged request is parked until
+    the ETag changes or the timeout passes; it is re-read after every publish
+    on that channel.
+    """
+    if etag is None:
+        etag = get_etag()
+    if etag is None or not etag_matches(request, etag):
+        return etag, None
+
+    timeout = long_poll_timeout(request) if channel else 0
+    if timeout:
+        # subscribe before re-reading so a change in between isn't missed
+        deadline = time.monotonic() + timeout
+        with realtime.listen(channel) as changed:
+            etag = get_etag()
+            # not everything published changes the ETag (typing, presence), keep
+            # waiting out the rest of the timeout after those
+            while etag is not None and etag_matches(request, etag):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not changed.wait(remaining):
+                    break
+                changed.clear()
+                etag = get_etag()
+        if etag is None or not etag_matches(request, etag):
+            return etag, None
+
+    response = Response(status=304)
+    response["ETag"] = etag
+    return etag, response
@@ -0,0 +1,72 @@
+import base64
+import binascii
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# Cursors look like "<microseconds since epoch>_<key>", e.g. "1732000000000000_3f2a...".
+# They are safe to put in a query string (no "+" or ":") and compare in the same
+# order as the (user_id, created_at) index of the contacts they page through.
+# Message cursors are just the message's Message.seq.
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(moment, key):
+    micros = (moment - EPOCH) // MICROSECOND
+    return f"{micros}_{key}"
+
+
+def decode_cursor(token):
+    micros, sep, key = str(token).partition("_")
+    if not sep or not key:
+        raise InvalidCursor(token)
+    try:
+        moment = EPOCH + int(micros) * MICROSECOND
+    except (ValueError, OverflowError):
+        raise InvalidCursor(token)
+    return moment, key
+
+
+def message_cursor(message):
+    return str(message.seq)
+
+
+def decode_message_cursor(token):
+    """The seq of a message cursor."""
+    # digits only, int() would also take "1_000" or " 1"
+    if not (isinstance(token, str) and token.isascii() and token.isdecimal()):
+        raise InvalidCursor(token)
+    return int(token)
+
+
+def decode_legacy_message_cursor(token):
+    """Message id of a cursor from before Message.seq, "<microseconds>_<message id hex>"."""
+    _, key = decode_cursor(token)
+    try:
+        return uuid.UUID(key)
+    except ValueError:
+        raise InvalidCursor(token)
+
+
+# Sync token for an empty chat: every message sorts after it.
+MESSAGE_CURSOR_START = "0"
+
+
+def contact_cursor(created_at, email):
+    # emails may contain "+", which would not survive a query string unencoded
+    key = base64.urlsafe_b64encode(email.encode()).decode().rstrip("=")
+    return encode_cursor(created_at, key)
+
+
+def decode_contact_cursor(token):
+    moment, key = decode_cursor(token)
+    try:
+        email = base64.urlsafe_b64decode(key + "=" * (-len(key) % 4)).decode()
+    except (binascii.Error, ValueError):
+        raise InvalidCursor(token)
+    return moment, email
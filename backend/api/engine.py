@@ -0,0 +1,79 @@
+# N x N board with k in a row to win (e.g. 15x15 gomoku with k = 5), stored as
+# one byte per cell in row order: 0 empty, 1 X, 2 O. Fields are numbered from 1
+# like on the classic board. Classic 3x3 games keep using api/bitboard.py.
+
+from . import bitboard
+
+CLASSIC_SIZE = 3
+MAX_BOARD_SIZE = 19
+
+CODES = {"X": 1, "O": 2}
+SYMBOLS = {1: "X", 2: "O"}
+
+# right, down, down-right, down-left
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def is_classic(size, win_length):
+    return size == CLASSIC_SIZE and win_length == CLASSIC_SIZE
+
+
+def validate(size, win_length):
+    """Error message for an unsupported variant, None if it is fine."""
+    if not CLASSIC_SIZE <= size <= MAX_BOARD_SIZE:
+        return f"board_size must be {CLASSIC_SIZE}-{MAX_BOARD_SIZE}"
+    if not CLASSIC_SIZE <= win_length <= size:
+        return f"win_length must be {CLASSIC_SIZE}-{size}"
+    return None
+
+
+def new_board(size):
+    return bytes(size * size)
+
+
+def symbol_at(cells, field):
+    return SYMBOLS.get(cells[field - 1], bitboard.EMPTY)
+
+
+def place(cells, field, symbol):
+    cells = bytearray(cells)
+    cells[field - 1] = CODES[symbol]
+    return bytes(cells)
+
+
+def wins_through(cells, size, win_length, field):
+    """
+    Whether the symbol on `field` completes k in a row. Only the four lines
+    through that cell are walked, at most k - 1 cells each way, so the cost
+    does not depend on the board size.
+    """
+    row, col = divmod(field - 1, size)
+    code = cells[field - 1]
+
+    for d_row, d_col in DIRECTIONS:
+        count = 1
+        for sign in (1, -1):
+            r, c = row + sign * d_row, col + sign * d_col
+            while count < win_length and 0 <= r < size and 0 <= c < size and cells[r * size + c] == code:
+                count += 1
+                r, c = r + sign * d_row, c + sign * d_col
+        if count >= win_length:
+            return True
+    return False
+
+
+def winner_after(cells, size, win_length, field, moves):
+    """
+    "X", "O", "DRAW" or None after a move on `field`, same as bitboard.winner().
+    `moves` counts the symbols on the board including this one, so a full board
+    is seen without scanning it.
+    """
+    if wins_through(cells, size, win_length, field):
+        return SYMBOLS[cells[field - 1]]
+    if moves >= size * size:
+        return "DRAW"
+    return None
+
+
+def to_fields(cells):
+    return {f"field_{field}": symbol_at(cells, field) for field in range(1, len(cells) + 1)}
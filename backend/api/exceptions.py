@@ -0,0 +1,15 @@
+from rest_framework import exceptions
+from rest_framework.views import exception_handler as drf_exception_handler
+
+# kept from before DRF authentication, DRF's own text is translated (LANGUAGE_CODE)
+NOT_AUTHENTICATED_MESSAGE = "Authorization header missing or invalid."
+
+
+def exception_handler(exc, context):
+    # DRF's handler, with {"detail": ...} renamed to the {"error": ...} shape the views use
+    response = drf_exception_handler(exc, context)
+    if response is not None and isinstance(exc, exceptions.NotAuthenticated):
+        response.data = {"error": NOT_AUTHENTICATED_MESSAGE}
+    elif response is not None and isinstance(response.data, dict) and set(response.data) == {"detail"}:
+        response.data = {"error": response.data["detail"]}
+    return response
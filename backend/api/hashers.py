@@ -0,0 +1,131 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    BasePasswordHasher,
+    PBKDF2PasswordHasher,
+    make_password,
+    mask_hash,
+)
+from django.contrib.auth.hashers import verify_password as verify_encoded
+from django.utils.crypto import constant_time_compare
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the work factor from settings.PASSWORD_HASH_ITERATIONS.
+    Hashes stored with a different iteration count are re-hashed on the next
+    successful login, so changing the setting migrates users gradually.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+class UnsaltedSHA256PasswordHasher(BasePasswordHasher):
+    """
+    Verifies the unsalted SHA-256 digests stored by earlier versions, kept as
+    "unsalted_sha256$$<hexdigest>". Never used for new passwords; a login with
+    one of these upgrades it to the preferred hasher.
+    """
+
+    algorithm = "unsalted_sha256"
+
+    def salt(self):
+        return ""
+
+    def encode(self, password, salt):
+        if salt != "":
+            raise ValueError("salt must be empty.")
+        return "%s$$%s" % (self.algorithm, hashlib.sha256(password.encode()).hexdigest())
+
+    def decode(self, encoded):
+        algorithm, empty, hash = encoded.split("$", 2)
+        assert algorithm == self.algorithm
+        return {
+            "algorithm": algorithm,
+            "hash": hash,
+            "salt": None,
+        }
+
+    def verify(self, password, encoded):
+        return constant_time_compare(encoded, self.encode(password, ""))
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return {
+            "algorithm": decoded["algorithm"],
+            "hash": mask_hash(decoded["hash"]),
+        }
+
+    def harden_runtime(self, password, encoded):
+        pass
+
+
+class HashingPoolSaturated(Exception):
+    """All hashing workers are busy and the wait queue is full."""
+
+
+_pool = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool, _pool_slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = settings.PASSWORD_HASH_WORKERS
+                _pool_slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASH_QUEUE_SIZE)
+                _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+    return _pool, _pool_slots
+
+
+def run_hashing(func, *args):
+    """
+    Run CPU-heavy hashing on the bounded pool and wait for the result. At most
+    PASSWORD_HASH_WORKERS hashes run at once (hashlib releases the GIL, so
+    threads are enough) and PASSWORD_HASH_QUEUE_SIZE more may wait; beyond
+    that HashingPoolSaturated is raised instead of queueing, so a login storm
+    cannot tie up every request worker.
+    """
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise HashingPoolSaturated()
+    try:
+        future = pool.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future.result()
+
+
+def hash_password(password):
+    return run_hashing(make_password, password)
+
+
+def verify_password(user, password):
+    """
+    Check `password` against `user.hashed_password`, re-hashing it when the stored
+    hash uses an old algorithm or cost. `user` may be None (unknown email), the
+    same amount of hashing work is done so response times don't reveal it.
+    Raises HashingPoolSaturated when the hashing pool is full.
+    """
+    if user is None:
+        run_hashing(make_password, password)
+        return False
+
+    is_correct, must_update = run_hashing(verify_encoded, password, user.hashed_password)
+    if is_correct and must_update:
+        try:
+            user.hashed_password = run_hashing(make_password, password)
+        except HashingPoolSaturated:
+            # upgrade on a later login
+            return True
+        user.save(update_fields=["hashed_password"])
+    return is_correct
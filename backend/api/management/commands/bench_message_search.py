@@ -0,0 +1,106 @@
+import itertools
+import random
+import statistics
+import string
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import search
+from api.models import Chat, ChatParticipant, Message, User
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic chat history (inside a transaction that is "
+        "rolled back at the end) and measure indexing and search latency, compared "
+        "with a content__icontains scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1000000, help="Messages to generate.")
+        parser.add_argument("--chats", type=int, default=1000, help="Chats to spread them over.")
+        parser.add_argument("--member-of", type=int, default=50, help="Chats the searching user is in.")
+        parser.add_argument("--vocabulary", type=int, default=20000, help="Distinct words (Zipf-distributed).")
+        parser.add_argument("--queries", type=int, default=200, help="Searches to time.")
+        parser.add_argument("--scans", type=int, default=5, help="icontains scans to time for comparison.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        vocabulary = self.make_vocabulary(rng, options["vocabulary"])
+        cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+        self.stdout.write(f"backend: {'postgresql tsvector + GIN' if search.uses_postgres() else 'inverted index table'}")
+        with transaction.atomic():
+            searcher, chat_ids = self.make_chats(options["chats"], options["member_of"])
+
+            start = time.perf_counter()
+            last_seq = Counter()
+            for offset in range(0, options["messages"], BATCH_SIZE):
+                count = min(BATCH_SIZE, options["messages"] - offset)
+                messages = []
+                for _ in range(count):
+                    chat_id = rng.choice(chat_ids)
+                    last_seq[chat_id] += 1
+                    messages.append(Message(
+                        chat_id_id=chat_id,
+                        sender_id=searcher,
+                        content=" ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(3, 15))),
+                        seq=last_seq[chat_id],
+                    ))
+                messages = Message.objects.bulk_create(messages)
+                search.index_messages(messages)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"insert + index: {elapsed:.1f} s, {options['messages'] / elapsed:.0f} messages/s"
+            )
+
+            # words from the middle of the distribution, rare words are trivially fast
+            middle = vocabulary[len(vocabulary) // 100:len(vocabulary) // 10]
+            queries = [" ".join(rng.sample(middle, rng.randint(1, 2))) for _ in range(options["queries"])]
+            self.report("search", [self.time(search.search_messages, searcher.id, query, 20, 0) for query in queries])
+
+            member_chats = ChatParticipant.objects.filter(user_id=searcher).values("chat_id")
+            scans = [
+                self.time(lambda word: list(
+                    Message.objects.filter(chat_id__in=member_chats, content__icontains=word).order_by("-sent_at")[:20]
+                ), word)
+                for word in rng.sample(middle, options["scans"])
+            ]
+            self.report("icontains", scans)
+
+            transaction.set_rollback(True)
+
+    def make_vocabulary(self, rng, size):
+        words = set()
+        while len(words) < size:
+            words.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))))
+        return sorted(words, key=lambda word: rng.random())
+
+    def make_chats(self, chats, member_of):
+        searcher = User.objects.create(email="bench-searcher@example.com", hashed_password="!")
+        other = User.objects.create(email="bench-other@example.com", hashed_password="!")
+        chat_objects = Chat.objects.bulk_create([Chat() for _ in range(chats)])
+        ChatParticipant.objects.bulk_create([
+            ChatParticipant(chat_id=chat, user_id=searcher if i < member_of else other)
+            for i, chat in enumerate(chat_objects)
+        ])
+        return searcher, [chat.id for chat in chat_objects]
+
+    def time(self, func, *args):
+        start = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - start
+
+    def report(self, label, timings):
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{label:>10}: p50 {statistics.median(timings) * 1000:.1f} ms, "
+            f"p99 {p99 * 1000:.1f} ms, max {timings[-1] * 1000:.1f} ms ({len(timings)} queries)"
+        )
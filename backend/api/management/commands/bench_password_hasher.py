@@ -0,0 +1,47 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.hashers import TunablePBKDF2PasswordHasher
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure password verification latency (what a login costs) at one or more "
+        "PBKDF2 work factors, single-threaded, to size auth workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations", type=int, nargs="+",
+            help="Work factors to compare (default: PASSWORD_HASH_ITERATIONS).",
+        )
+        parser.add_argument("--samples", type=int, default=50, help="Verifications per work factor.")
+
+    def handle(self, *args, **options):
+        hasher = TunablePBKDF2PasswordHasher()
+        costs = options["iterations"] or [settings.PASSWORD_HASH_ITERATIONS]
+        samples = options["samples"]
+
+        self.stdout.write(f"{'iterations':>12} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'logins/s/core':>14}")
+        for iterations in costs:
+            encoded = hasher.encode("correct horse battery staple", hasher.salt(), iterations)
+            hasher.verify("correct horse battery staple", encoded)  # warm-up
+
+            timings = []
+            for _ in range(samples):
+                start = time.perf_counter()
+                hasher.verify("correct horse battery staple", encoded)
+                timings.append(time.perf_counter() - start)
+
+            timings.sort()
+            p50 = statistics.median(timings)
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            throughput = 1 / statistics.mean(timings)
+            marker = "  <- configured" if iterations == settings.PASSWORD_HASH_ITERATIONS else ""
+            self.stdout.write(
+                f"{iterations:>12} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f} {timings[-1] * 1000:>9.1f} "
+                f"{throughput:>14.1f}{marker}"
+            )
@@ -0,0 +1,38 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from api import solver
+
+
+class Command(BaseCommand):
+    help = "Measure how long the tic-tac-toe solver table takes to build, its memory and the cost of a lookup."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--builds", type=int, default=5, help="Table builds to time.")
+        parser.add_argument("--lookups", type=int, default=1000000, help="Lookups to time.")
+
+    def handle(self, *args, **options):
+        tracemalloc.start()
+        table = solver.build_table()
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings = []
+        for _ in range(options["builds"]):
+            start = time.perf_counter()
+            solver.build_table()
+            timings.append(time.perf_counter() - start)
+
+        boards = list(table)
+        lookups = options["lookups"]
+        start = time.perf_counter()
+        for i in range(lookups):
+            solver.lookup(boards[i % len(boards)])
+        lookup_time = (time.perf_counter() - start) / lookups
+
+        self.stdout.write(f"positions:   {len(table)}")
+        self.stdout.write(f"build:       {min(timings) * 1000:.1f} ms (best of {len(timings)})")
+        self.stdout.write(f"memory:      {size / 1024:.0f} KiB held, {peak / 1024:.0f} KiB peak while building")
+        self.stdout.write(f"lookup:      {lookup_time * 1e9:.0f} ns")
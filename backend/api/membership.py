@@ -0,0 +1,91 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ChatParticipant
+from .ttlcache import TTLCache
+
+# Who is in which chat, asked on every message send and socket subscribe.
+# Cached per chat as {user_id: email} (the email is what MessageSerializer shows
+# for the sender). Entries are dropped when participants are added or removed
+# and live at most CHAT_MEMBERSHIP_CACHE_TTL seconds, which bounds how stale
+# another process' copy can get when the per-process store is used.
+
+
+def cache_key(chat_id):
+    return f"chat-members:{chat_id}"
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.CHAT_MEMBERSHIP_CACHE_ALIAS:
+                    _store = caches[settings.CHAT_MEMBERSHIP_CACHE_ALIAS]
+                else:
+                    _store = TTLCache(settings.CHAT_MEMBERSHIP_CACHE_SIZE)
+    return _store
+
+
+def members_of(chat_ids):
+    """
+    {chat_id: {user_id: email}} for the given chats (UUIDs, ValueError otherwise),
+    with one query for all cache misses. Keys are str(UUID).
+    """
+    chat_ids = {str(uuid.UUID(str(chat_id))) for chat_id in chat_ids}
+    cached = get_store().get_many([cache_key(chat_id) for chat_id in chat_ids])
+    found = {chat_id: cached[cache_key(chat_id)] for chat_id in chat_ids if cache_key(chat_id) in cached}
+
+    missing = chat_ids - found.keys()
+    if missing:
+        loaded = {chat_id: {} for chat_id in missing}
+        rows = ChatParticipant.objects.filter(chat_id__in=missing).values_list("chat_id", "user_id", "user_id__email")
+        for chat_id, user_id, email in rows:
+            loaded[str(chat_id)][str(user_id)] = email
+        get_store().set_many(
+            {cache_key(chat_id): members for chat_id, members in loaded.items()}, settings.CHAT_MEMBERSHIP_CACHE_TTL
+        )
+        found.update(loaded)
+    return found
+
+
+def members(chat_id):
+    """{user_id: email} of the chat's participants, empty for unknown chats."""
+    return members_of([chat_id])[str(uuid.UUID(str(chat_id)))]
+
+
+def is_member(chat_id, user_id):
+    """False for malformed ids too."""
+    try:
+        return str(uuid.UUID(str(user_id))) in members(chat_id)
+    except ValueError:
+        return False
+
+
+def invalidate(*chat_ids):
+    keys = [cache_key(chat_id) for chat_id in chat_ids]
+    get_store().delete_many(keys)
+    # again once the change is visible, a concurrent read may have cached the old list meanwhile
+    transaction.on_commit(lambda: get_store().delete_many(keys))
+
+
+def invalidate_user(user_id):
+    """After a change to the user that the cached lists show, e.g. the email."""
+    invalidate(*ChatParticipant.objects.filter(user_id=user_id).values_list("chat_id", flat=True))
+
+
+@receiver(post_save, sender=ChatParticipant)
+@receiver(post_delete, sender=ChatParticipant)
+def participant_changed(sender, instance, **kwargs):
+    # bulk_create sends no signals, callers invalidate explicitly
+    invalidate(instance.chat_id_id)
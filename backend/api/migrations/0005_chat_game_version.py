@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_message_chat_sent_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
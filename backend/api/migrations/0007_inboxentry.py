@@ -0,0 +1,68 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_inbox(apps, schema_editor):
+    Chat = apps.get_model('api', 'Chat')
+    ChatParticipant = apps.get_model('api', 'ChatParticipant')
+    Message = apps.get_model('api', 'Message')
+    InboxEntry = apps.get_model('api', 'InboxEntry')
+
+    participants = {}
+    for chat_id, user_id in ChatParticipant.objects.values_list('chat_id', 'user_id'):
+        participants.setdefault(chat_id, []).append(user_id)
+
+    entries = []
+    for chat in Chat.objects.filter(id__in=participants.keys()).iterator():
+        members = participants[chat.id]
+        messages = Message.objects.filter(chat_id=chat.id)
+        last = messages.order_by('-sent_at', '-id').first()
+
+        for user_id in members:
+            others = [other for other in members if other != user_id]
+            # nothing recorded what was read before, every message from the others counts
+            unread = messages.exclude(sender_id=user_id)
+            entries.append(InboxEntry(
+                user_id_id=user_id,
+                chat_id_id=chat.id,
+                other_user_id_id=others[0] if others else None,
+                last_message_id=last.id if last else None,
+                last_message_preview=last.content[:100] if last else '',
+                last_message_at=last.sent_at if last else None,
+                last_activity_at=last.sent_at if last else chat.created_at,
+                unread_count=unread.count(),
+            ))
+
+    InboxEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_chat_game_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_id', models.UUIDField(blank=True, null=True)),
+                ('last_message_preview', models.CharField(blank=True, default='', max_length=100)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('last_activity_at', models.DateTimeField()),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('chat_id', models.ForeignKey(db_column='chat_id', on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='api.chat')),
+                ('other_user_id', models.ForeignKey(blank=True, db_column='other_user_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.user')),
+                ('user_id', models.ForeignKey(db_column='user_id', on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='api.user')),
+            ],
+            options={
+                'db_table': 'inbox_entries',
+                'indexes': [models.Index(fields=['user_id', '-last_activity_at'], name='inbox_user_activity_idx')],
+                'unique_together': {('user_id', 'chat_id')},
+            },
+        ),
+        migrations.RunPython(backfill_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:44
+
+from django.db import migrations, models
+
+
+def backfill_direct_keys(apps, schema_editor):
+    Chat = apps.get_model('api', 'Chat')
+    ChatParticipant = apps.get_model('api', 'ChatParticipant')
+
+    members = {}
+    for chat_id, user_id in ChatParticipant.objects.values_list('chat_id', 'user_id'):
+        members.setdefault(chat_id, []).append(str(user_id))
+
+    # duplicates created by concurrent requests: the oldest chat keeps the key
+    seen = set()
+    for chat in Chat.objects.filter(id__in=members.keys()).order_by('created_at'):
+        users = members[chat.id]
+        if len(users) != 2:
+            continue
+        key = ':'.join(sorted(users))
+        if key in seen:
+            continue
+        seen.add(key)
+        chat.direct_key = key
+        chat.save(update_fields=['direct_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_inboxentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='direct_key',
+            field=models.CharField(blank=True, max_length=73, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_direct_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:44
+
+from django.db import migrations
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+
+LEGACY_PREFIX = 'unsalted_sha256$$'
+
+
+def wrap_legacy_hashes(apps, schema_editor):
+    # bare sha256 hex digests -> "unsalted_sha256$$<hex>" so Django's
+    # check_password can identify them and upgrade them on the next login
+    User = apps.get_model('api', 'User')
+    User.objects.exclude(hashed_password__contains='$').update(
+        hashed_password=Concat(Value(LEGACY_PREFIX), 'hashed_password')
+    )
+
+
+def unwrap_legacy_hashes(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    User.objects.filter(hashed_password__startswith=LEGACY_PREFIX).update(
+        hashed_password=Substr('hashed_password', len(LEGACY_PREFIX) + 1)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_chat_direct_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(wrap_legacy_hashes, unwrap_legacy_hashes),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:48
+
+from django.db import migrations, models
+
+FIELDS = [f'field_{i}' for i in range(1, 10)]
+SHIFTS = {'X': 0, 'O': 9}
+
+
+def pack_boards(apps, schema_editor):
+    Game = apps.get_model('api', 'Game')
+    for game in Game.objects.only('id', *FIELDS).iterator():
+        bits = 0
+        for cell, name in enumerate(FIELDS):
+            symbol = getattr(game, name)
+            if symbol in SHIFTS:
+                bits |= 1 << (cell + SHIFTS[symbol])
+        Game.objects.filter(id=game.id).update(board_bits=bits)
+
+
+def unpack_boards(apps, schema_editor):
+    Game = apps.get_model('api', 'Game')
+    for game in Game.objects.only('id', 'board_bits').iterator():
+        values = {}
+        for cell, name in enumerate(FIELDS):
+            values[name] = 'EMPTY'
+            for symbol, shift in SHIFTS.items():
+                if game.board_bits & (1 << (cell + shift)):
+                    values[name] = symbol
+        Game.objects.filter(id=game.id).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_wrap_legacy_password_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='board_bits',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(pack_boards, unpack_boards),
+    ] + [
+        migrations.RemoveField(
+            model_name='game',
+            name=name,
+        )
+        for name in FIELDS
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+
+def backfill_players_keys(apps, schema_editor):
+    Game = apps.get_model('api', 'Game')
+
+    # duplicate games for the same pair: the oldest one keeps the key
+    seen = set()
+    for game in Game.objects.order_by('created_at').only('id', 'player_1_id', 'player_2_id'):
+        key = ':'.join(sorted([str(game.player_1_id_id), str(game.player_2_id_id)]))
+        if key in seen:
+            continue
+        seen.add(key)
+        game.players_key = key
+        game.save(update_fields=['players_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_game_board_bits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='players_key',
+            field=models.CharField(blank=True, max_length=73, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_players_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def count_finished_rounds(apps, schema_editor):
+    Game = apps.get_model('api', 'Game')
+
+    # earlier rounds were overwritten on restart, only the last result is known
+    Game.objects.filter(is_finished=True, winner__isnull=True).update(draws=1)
+    Game.objects.filter(is_finished=True, winner=models.F('player_1_id')).update(player_1_wins=1)
+    Game.objects.filter(is_finished=True, winner=models.F('player_2_id')).update(player_2_wins=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_game_players_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='draws',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='player_1_wins',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='player_2_wins',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='round',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='GameMove',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('round', models.PositiveIntegerField()),
+                ('move_index', models.PositiveSmallIntegerField()),
+                ('field', models.PositiveSmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('game_id', models.ForeignKey(db_column='game_id', on_delete=django.db.models.deletion.CASCADE, related_name='moves', to='api.game')),
+                ('player_id', models.ForeignKey(db_column='player_id', on_delete=django.db.models.deletion.CASCADE, related_name='game_moves', to='api.user')),
+            ],
+            options={
+                'db_table': 'game_moves',
+                'unique_together': {('game_id', 'round', 'move_index')},
+            },
+        ),
+        migrations.RunPython(count_finished_rounds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:58
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def add_search_vector(apps, schema_editor):
+    # PostgreSQL keeps a tsvector of every message in a generated column,
+    # other databases get the message_search_terms index filled below
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "ALTER TABLE messages ADD COLUMN search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple'::regconfig, content)) STORED"
+    )
+    schema_editor.execute("CREATE INDEX messages_search_idx ON messages USING GIN (search_vector)")
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS messages_search_idx")
+    schema_editor.execute("ALTER TABLE messages DROP COLUMN IF EXISTS search_vector")
+
+
+def index_existing_messages(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    Message = apps.get_model('api', 'Message')
+    MessageSearchTerm = apps.get_model('api', 'MessageSearchTerm')
+
+    terms = []
+    for message_id, chat_id, content in Message.objects.values_list('id', 'chat_id', 'content').iterator():
+        for term, count in Counter(word[:64] for word in re.findall(r'\w+', content.lower())).items():
+            terms.append(MessageSearchTerm(term=term, message_id_id=message_id, chat_id_id=chat_id, count=count))
+        if len(terms) >= 5000:
+            MessageSearchTerm.objects.bulk_create(terms)
+            terms = []
+    MessageSearchTerm.objects.bulk_create(terms)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_game_board_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('count', models.PositiveSmallIntegerField(default=1)),
+                ('chat_id', models.ForeignKey(db_column='chat_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.chat')),
+                ('message_id', models.ForeignKey(db_column='message_id', on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='api.message')),
+            ],
+            options={
+                'db_table': 'message_search_terms',
+                'indexes': [models.Index(fields=['term', 'chat_id'], name='search_term_chat_idx')],
+            },
+        ),
+        migrations.RunPython(add_search_vector, drop_search_vector),
+        migrations.RunPython(index_existing_messages, migrations.RunPython.noop),
+    ]
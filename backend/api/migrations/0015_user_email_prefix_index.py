@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:06
+
+from django.db import migrations
+
+
+def add_email_prefix_index(apps, schema_editor):
+    # email__istartswith compiles to UPPER("email"::text) LIKE UPPER('...%') on
+    # PostgreSQL; text_pattern_ops lets a btree on that expression serve it
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE INDEX users_email_prefix_idx ON users (UPPER(email::text) text_pattern_ops)"
+    )
+
+
+def drop_email_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS users_email_prefix_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_message_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_email_prefix_index, drop_email_prefix_index),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+def number_messages(apps, schema_editor):
+    # 1..n per chat in the old (sent_at, id) order; the chat versions move past
+    # the numbers handed out so new messages continue after them
+    schema_editor.execute(
+        """
+        UPDATE messages SET seq = numbered.n
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY chat_id ORDER BY sent_at, id) AS n
+            FROM messages
+        ) AS numbered
+        WHERE messages.id = numbered.id
+        """
+    )
+    schema_editor.execute(
+        "UPDATE chats SET version = version + (SELECT COUNT(*) FROM messages WHERE messages.chat_id = chats.id)"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_contact_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='seq',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.RunPython(number_messages, migrations.RunPython.noop),
+    ]
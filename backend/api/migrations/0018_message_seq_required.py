@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # separate from 0017: PostgreSQL refuses ALTER TABLE on rows updated earlier
+    # in the same transaction while deferred foreign key checks are pending
+
+    dependencies = [
+        ('api', '0017_message_seq'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='seq',
+            field=models.PositiveBigIntegerField(),
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='messages_chat_sent_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(fields=('chat_id', 'seq'), name='messages_chat_seq_uniq'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_server_games(apps, schema_editor):
+    Game = apps.get_model('api', 'Game')
+    Game.objects.filter(player_2_id__email=settings.GAME_SERVER_PLAYER_EMAIL).update(vs_server=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_message_seq_required'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='vs_server',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_server_games, migrations.RunPython.noop),
+    ]
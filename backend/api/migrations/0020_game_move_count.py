@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+def count_moves(apps, schema_editor):
+    Game = apps.get_model('api', 'Game')
+    for game in Game.objects.only('board_bits', 'cells').iterator():
+        if game.cells is None:
+            moves = bin(game.board_bits).count('1')
+        else:
+            moves = len(game.cells) - bytes(game.cells).count(0)
+        if moves:
+            Game.objects.filter(id=game.id).update(move_count=moves)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_game_vs_server'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='move_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(count_moves, migrations.RunPython.noop),
+    ]
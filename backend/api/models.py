@@ -5,6 +5,12 @@ from django.core.exceptions import ValidationError
 
 # Create your models here.
 
+
+def pair_key(user_id_1, user_id_2):
+    """Order-independent key for a pair of users, e.g. for one-on-one chats."""
+    first, second = sorted([str(user_id_1), str(user_id_2)])
+    return f"{first}:{second}"
+
 class User(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField(unique=True, max_length=255)
@@ -37,6 +43,9 @@ class Contact(models.Model):
     class Meta:
         db_table = 'contacts'
         unique_together = ['user_id', 'contact_id']
+        indexes = [
+            models.Index(fields=['user_id', 'created_at'], name='contacts_user_created_idx'),
+        ]
 
 
     def __str__(self):
@@ -46,6 +55,11 @@ class Contact(models.Model):
 class Chat(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # bumped by one per new message (the new value is its Message.seq), used as
+    # the ETag of the message list
+    version = models.PositiveBigIntegerField(default=0)
+    # pair_key() of the two users for one-on-one chats, NULL for other chats
+    direct_key = models.CharField(max_length=73, unique=True, null=True, blank=True)
 
     class Meta:
         db_table = 'chats'
@@ -93,10 +107,16 @@ class Message(models.Model):
     )
     content = models.TextField()
     sent_at = models.DateTimeField(auto_now_add=True)
+    # position in the chat, taken from Chat.version while the chat row is locked:
+    # messages commit in seq order, so an ?after= cursor never skips a late commit
+    seq = models.PositiveBigIntegerField()
 
     class Meta:
         db_table = 'messages'
         ordering = ['sent_at']
+        constraints = [
+            models.UniqueConstraint(fields=['chat_id', 'seq'], name='messages_chat_seq_uniq'),
+        ]
 
     def __str__(self):
         sender = self.sender_id.email if self.sender_id else "Deleted user"
@@ -104,14 +124,83 @@ class Message(models.Model):
 
 
 
+class MessageSearchTerm(models.Model):
+    """
+    Inverted index (term -> message) for message search on databases without
+    built-in full-text search, see api/search.py. Empty on PostgreSQL.
+    """
+    TERM_LENGTH = 64
 
-class Game(models.Model):
-    SYMBOL_CHOICES = [
-        ('EMPTY', 'Empty'),
-        ('X', 'X'),
-        ('O', 'O'),
-    ]
+    term = models.CharField(max_length=TERM_LENGTH)
+    message_id = models.ForeignKey(
+        Message,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        db_column='message_id'
+    )
+    chat_id = models.ForeignKey(
+        Chat,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_column='chat_id'
+    )
+    # occurrences of the term in the message
+    count = models.PositiveSmallIntegerField(default=1)
 
+    class Meta:
+        db_table = 'message_search_terms'
+        indexes = [
+            models.Index(fields=['term', 'chat_id'], name='search_term_chat_idx'),
+        ]
+
+class InboxEntry(models.Model):
+    """
+    One row per (user, chat) with everything the chat list shows, kept up to date
+    by the write views so listing chats never has to look at messages.
+    """
+    PREVIEW_LENGTH = 100
+
+    user_id = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='inbox_entries',
+        db_column='user_id'
+    )
+    chat_id = models.ForeignKey(
+        Chat,
+        on_delete=models.CASCADE,
+        related_name='inbox_entries',
+        db_column='chat_id'
+    )
+    other_user_id = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        db_column='other_user_id'
+    )
+    last_message_id = models.UUIDField(null=True, blank=True)
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH, blank=True, default='')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    # last message time, or chat creation time for chats without messages
+    last_activity_at = models.DateTimeField()
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'inbox_entries'
+        unique_together = ['user_id', 'chat_id']
+        indexes = [
+            models.Index(fields=['user_id', '-last_activity_at'], name='inbox_user_activity_idx'),
+        ]
+
+    def __str__(self):
+        return f"Inbox of {self.user_id_id} for {self.chat_id_id}"
+
+
+
+
+class Game(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
     player_1_id = models.ForeignKey(
@@ -126,20 +215,24 @@ class Game(models.Model):
         related_name='games_as_player_2',
         db_column='player_2_id'
     )
+    # pair_key() of the two players, one game per pair
+    players_key = models.CharField(max_length=73, unique=True, null=True, blank=True)
+    # player 2 is the server player, its moves come from api/solver.py
+    vs_server = models.BooleanField(default=False)
 
     player_1_symbol = models.CharField(max_length=5, choices=[('X', 'X'), ('O', 'O')])
     player_2_symbol = models.CharField(max_length=5, choices=[('X', 'X'), ('O', 'O')])
 
 
-    field_1 = models.CharField(max_length=5, choices=SYMBOL_CHOICES, default='EMPTY')
-    field_2 = models.CharField(max_length=5, choices=SYMBOL_CHOICES, default='EMPTY')
-    field_3 = models.CharField(max_length=5, choices=SYMBOL_CHOICES, default='EMPTY')
-    field_4 = models.CharField(max_length=5, choices=SYMBOL_CHOICES, default='EMPTY')
-    field_5 = models.CharField(max_length=5, choices=SYMBOL_CHOICES, default='EMPTY')
-    field_6 = models.CharField(max_length=5, choices=SYMBOL_CHOICES, default='EMPTY')
-    field_7 = models.CharField(max_length=5, choices=SYMBOL_CHOICES, default='EMPTY')
-    field_8 = models.CharField(max_length=5, choices=SYMBOL_CHOICES, default='EMPTY')
-    field_9 = models.CharField(max_length=5, choices=SYMBOL_CHOICES, default='EMPTY')
+    board_size = models.PositiveSmallIntegerField(default=3)
+    win_length = models.PositiveSmallIntegerField(default=3)
+
+    # X and O cells packed into one integer, see api/bitboard.py (3x3 games)
+    board_bits = models.PositiveIntegerField(default=0)
+    # one byte per cell, see api/engine.py (all other sizes, null on 3x3)
+    cells = models.BinaryField(null=True, blank=True)
+    # symbols on the board, a full board without a winner is a draw
+    move_count = models.PositiveSmallIntegerField(default=0)
 
     current_turn = models.ForeignKey(
         User,
@@ -160,6 +253,16 @@ class Game(models.Model):
 
     is_finished = models.BooleanField(default=False)
 
+    # bumped on every board change, used as the ETag of get_game
+    version = models.PositiveBigIntegerField(default=0)
+
+    # current round, restart_game starts the next one
+    round = models.PositiveIntegerField(default=1)
+    # results of all finished rounds, counted when a round ends
+    player_1_wins = models.PositiveIntegerField(default=0)
+    player_2_wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -172,3 +275,31 @@ class Game(models.Model):
     def clean(self):
         if self.player_1_symbol == self.player_2_symbol:
             raise ValidationError("Both players cannot have the same symbol!")
+
+
+class GameMove(models.Model):
+    """Append-only log of moves, one row per placed symbol."""
+    game_id = models.ForeignKey(
+        Game,
+        on_delete=models.CASCADE,
+        related_name='moves',
+        db_column='game_id'
+    )
+    round = models.PositiveIntegerField()
+    # 1-based position of the move within its round
+    move_index = models.PositiveSmallIntegerField()
+    field = models.PositiveSmallIntegerField()
+    player_id = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='game_moves',
+        db_column='player_id'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'game_moves'
+        unique_together = ['game_id', 'round', 'move_index']
+
+    def __str__(self):
+        return f"Move {self.move_index} of round {self.round} in game {self.game_id_id}"
@@ -0,0 +1,102 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import membership, realtime
+from .models import Contact
+from .ttlcache import TTLCache
+
+# Online status and typing indicators. Both are short-lived and rewritten every
+# few seconds by every connected client, so they never touch the database: a
+# heartbeat stores the time it arrived under the user's key and a user counts as
+# online while the last one is at most PRESENCE_TIMEOUT seconds old. The entry
+# itself is kept for LAST_SEEN_TTL so contacts can show "last seen".
+#
+# Typing is announced on the chat's push channel as
+# {"type": "typing", "chat_id": ..., "user_id": ..., "typing": true/false};
+# clients should treat it as stopped after TYPING_TTL seconds without a repeat.
+# Clients may report typing on every keystroke; it is announced again at most
+# every TYPING_TTL / 2 seconds.
+
+LAST_SEEN_TTL = 24 * 60 * 60
+TYPING_TTL = 6
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.PRESENCE_CACHE_ALIAS:
+                    _store = caches[settings.PRESENCE_CACHE_ALIAS]
+                else:
+                    _store = TTLCache(settings.PRESENCE_CACHE_SIZE)
+    return _store
+
+
+def seen_key(user_id):
+    return f"presence:{user_id}"
+
+
+def typing_key(chat_id, user_id):
+    return f"typing:{chat_id}:{user_id}"
+
+
+def heartbeat(user_id):
+    get_store().set(seen_key(user_id), time.time(), LAST_SEEN_TTL)
+
+
+def status(last_seen, now):
+    return {
+        "online": last_seen is not None and now - last_seen <= settings.PRESENCE_TIMEOUT,
+        "last_seen": last_seen and datetime.fromtimestamp(last_seen, timezone.utc),
+    }
+
+
+def statuses(user_ids):
+    """{user_id: {"online", "last_seen"}} with one store read for all users."""
+    user_ids = [str(user_id) for user_id in user_ids]
+    found = get_store().get_many([seen_key(user_id) for user_id in user_ids])
+    now = time.time()
+    return {user_id: status(found.get(seen_key(user_id)), now) for user_id in user_ids}
+
+
+def contacts_presence(user_id):
+    """[{"id", "online", "last_seen"}] for all contacts of the user, one query plus one store read."""
+    contact_ids = Contact.objects.filter(user_id=user_id).values_list("contact_id", flat=True)
+    return [{"id": user_id, **state} for user_id, state in statuses(contact_ids).items()]
+
+
+def set_typing(chat_id, user_id, typing=True):
+    """
+    Mark the user as typing in the chat (or stopped) and tell the chat when
+    that changes or the last announcement is about to expire. False if the user
+    is not a member.
+    """
+    if not membership.is_member(chat_id, user_id):
+        return False
+    chat_id, user_id = str(uuid.UUID(str(chat_id))), str(uuid.UUID(str(user_id)))
+    heartbeat(user_id)
+
+    key = typing_key(chat_id, user_id)
+    announced_at = get_store().get_many([key]).get(key)
+    now = time.time()
+    if typing:
+        announce = announced_at is None or now - announced_at >= TYPING_TTL / 2
+        get_store().set(key, now if announce else announced_at, TYPING_TTL)
+    else:
+        announce = announced_at is not None
+        get_store().delete(key)
+
+    if announce:
+        realtime.publish(realtime.chat_channel(chat_id), {
+            "type": "typing", "chat_id": chat_id, "user_id": user_id, "typing": typing,
+        })
+    return True
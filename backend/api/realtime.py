@@ -0,0 +1,345 @@
+import asyncio
+import contextlib
+import json
+import re
+import threading
+from urllib.parse import parse_qs
+
+import jwt
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from . import membership, presence
+from .authentication import decode_token
+from .models import ChatParticipant, Game
+from .serializers import GameStateSerializer
+
+# Messages waiting for a slow socket before it gets disconnected; the client
+# reconnects and catches up with GET /api/messages/<chat_id>/?after=<sync_token>.
+SUBSCRIPTION_QUEUE_SIZE = 256
+
+
+class Broker:
+    """
+    Publish/subscribe over named channels. A shared implementation (e.g. Redis
+    pub/sub for several server processes) only has to provide these methods;
+    callbacks may be invoked from any thread.
+    """
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def subscribe(self, channel, callback):
+        raise NotImplementedError
+
+    def unsubscribe(self, channel, callback):
+        raise NotImplementedError
+
+
+class LocalBroker(Broker):
+    """In-process broker, delivers only to sockets served by this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, channel, message):
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, ()))
+        for callback in callbacks:
+            callback(message)
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(callback)
+
+    def unsubscribe(self, channel, callback):
+        with self._lock:
+            callbacks = self._subscribers.get(channel)
+            if callbacks is None:
+                return
+            callbacks.discard(callback)
+            if not callbacks:
+                del self._subscribers[channel]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.PUSH_BROKER)()
+    return _broker
+
+
+def publish(channel, message):
+    # serialized once here, every subscriber gets the same text frame
+    get_broker().publish(channel, json.dumps(message, cls=DjangoJSONEncoder))
+
+
+@contextlib.contextmanager
+def listen(channel):
+    """Blocking helper for sync code: yields an Event set on the next publish."""
+    changed = threading.Event()
+
+    def callback(message):
+        changed.set()
+
+    get_broker().subscribe(channel, callback)
+    try:
+        yield changed
+    finally:
+        get_broker().unsubscribe(channel, callback)
+
+
+def chat_channel(chat_id):
+    return f"chat:{chat_id}"
+
+
+def game_channel(game_id):
+    return f"game:{game_id}"
+
+
+class Subscription:
+    """Broker callback feeding one socket's queue, safe to call from any thread."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(SUBSCRIPTION_QUEUE_SIZE)
+        self.channels = set()
+
+    def add(self, channel):
+        if channel not in self.channels:
+            self.channels.add(channel)
+            get_broker().subscribe(channel, self.deliver)
+
+    def close(self):
+        for channel in self.channels:
+            get_broker().unsubscribe(channel, self.deliver)
+        self.channels.clear()
+
+    def deliver(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # event loop already closed, the socket is gone
+            pass
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # too slow to keep up: drop the backlog and disconnect
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+def database_sync_to_async(func):
+    """
+    sync_to_async for socket code that uses the database. Sockets live outside
+    the request cycle, so like Channels' helper of the same name this closes
+    broken or expired connections before and after the call. Runs on the shared
+    thread pool, not the one thread-sensitive executor, so sockets don't queue
+    behind each other.
+    """
+    def call(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=False)
+
+
+def authenticate_socket(scope):
+    token = None
+    for name, value in scope.get("headers", []):
+        if name == b"authorization" and value.startswith(b"Bearer "):
+            token = value[len(b"Bearer "):].decode()
+    if token is None:
+        query = parse_qs(scope.get("query_string", b"").decode())
+        token = query.get("token", [None])[0]
+    if not token:
+        return None
+
+    try:
+        claims = decode_token(token)
+    except jwt.InvalidTokenError:
+        return None
+    return claims.get("user_id")
+
+
+class PushSocket:
+    """
+    Minimal ASGI WebSocket endpoint: authenticates the token, subscribes the
+    connection to broker channels and forwards every published message as a
+    text frame. Idle connections cost nothing until something is published.
+    """
+
+    async def __call__(self, scope, receive, send):
+        event = await receive()
+        if event["type"] != "websocket.connect":
+            return
+
+        user_id = authenticate_socket(scope)
+        if user_id is None:
+            await send({"type": "websocket.close", "code": 4401})
+            return
+
+        channels = await self.get_channels(scope, user_id)
+        if channels is None:
+            await send({"type": "websocket.close", "code": 4403})
+            return
+
+        await send({"type": "websocket.accept"})
+
+        subscription = Subscription(asyncio.get_running_loop())
+        try:
+            for channel in channels:
+                subscription.add(channel)
+            for frame in await self.initial_frames(scope, user_id):
+                await send({"type": "websocket.send", "text": json.dumps(frame, cls=DjangoJSONEncoder)})
+            await self.pump(scope, user_id, subscription, receive, send)
+        finally:
+            subscription.close()
+
+    async def get_channels(self, scope, user_id):
+        return []
+
+    async def initial_frames(self, scope, user_id):
+        return []
+
+    async def handle_frame(self, scope, user_id, frame, subscription, send):
+        pass
+
+    async def pump(self, scope, user_id, subscription, receive, send):
+        async def read():
+            while True:
+                event = await receive()
+                if event["type"] == "websocket.disconnect":
+                    return
+                try:
+                    frame = json.loads(event.get("text") or "")
+                except ValueError:
+                    continue
+                if isinstance(frame, dict):
+                    await self.handle_frame(scope, user_id, frame, subscription, send)
+
+        async def write():
+            while True:
+                message = await subscription.queue.get()
+                if message is None:
+                    await send({"type": "websocket.close", "code": 4008})
+                    return
+                await send({"type": "websocket.send", "text": message})
+
+        tasks = [asyncio.ensure_future(read()), asyncio.ensure_future(write())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class ChatSocket(PushSocket):
+    """
+    /ws/chat/ - pushes {"type": "message", "message": {...}} for every chat of the
+    user. Chats created after connecting are added with {"type": "subscribe", "chat_id": ...}.
+    The client keeps itself online with {"type": "heartbeat"} and reports typing
+    with {"type": "typing", "chat_id": ..., "typing": true/false}, same as the
+    HTTP endpoints; other members get the typing frames of their chats.
+    """
+
+    async def get_channels(self, scope, user_id):
+        await sync_to_async(presence.heartbeat, thread_sensitive=False)(user_id)
+        chat_ids = await database_sync_to_async(_user_chat_ids)(user_id)
+        return [chat_channel(chat_id) for chat_id in chat_ids]
+
+    async def handle_frame(self, scope, user_id, frame, subscription, send):
+        if frame.get("type") == "heartbeat":
+            await sync_to_async(presence.heartbeat, thread_sensitive=False)(user_id)
+            return
+        if frame.get("type") == "typing":
+            typing = frame.get("typing", True)
+            if isinstance(typing, bool):
+                await database_sync_to_async(presence.set_typing)(frame.get("chat_id"), user_id, typing)
+            return
+        if frame.get("type") != "subscribe":
+            return
+
+        chat_id = frame.get("chat_id")
+        is_member = await database_sync_to_async(_is_chat_member)(chat_id, user_id)
+        reply = {"type": "subscribed" if is_member else "error", "chat_id": chat_id}
+        if is_member:
+            subscription.add(chat_channel(chat_id))
+        await send({"type": "websocket.send", "text": json.dumps(reply)})
+
+
+def _user_chat_ids(user_id):
+    return list(ChatParticipant.objects.filter(user_id=user_id).values_list("chat_id", flat=True))
+
+
+def _is_chat_member(chat_id, user_id):
+    # False for a malformed chat_id as well
+    return membership.is_member(chat_id, user_id)
+
+
+class GameSocket(PushSocket):
+    """
+    /ws/game/<game_id>/ - sends {"type": "game", "game": {...}} (same shape as
+    GET /api/game/) on connect and then only when a move or restart changes it.
+    """
+
+    async def get_channels(self, scope, user_id):
+        game_id = scope["url_route"]["kwargs"]["game_id"]
+        if not await database_sync_to_async(_is_game_player)(game_id, user_id):
+            return None
+        return [game_channel(game_id)]
+
+    async def initial_frames(self, scope, user_id):
+        game_id = scope["url_route"]["kwargs"]["game_id"]
+        state = await database_sync_to_async(_game_state)(game_id)
+        return [{"type": "game", "game": state}]
+
+
+def _is_game_player(game_id, user_id):
+    try:
+        return Game.objects.filter(id=game_id).filter(
+            Q(player_1_id=user_id) | Q(player_2_id=user_id)
+        ).exists()
+    except ValidationError:
+        return False
+
+
+def _game_state(game_id):
+    return GameStateSerializer(Game.objects.get(id=game_id)).data
+
+
+websocket_routes = [
+    (re.compile(r"^/ws/chat/$"), ChatSocket()),
+    (re.compile(r"^/ws/game/(?P<game_id>[0-9a-fA-F-]{32,36})/$"), GameSocket()),
+]
+
+
+async def websocket_application(scope, receive, send):
+    for pattern, handler in websocket_routes:
+        match = pattern.match(scope["path"])
+        if match:
+            scope = dict(scope, url_route={"kwargs": match.groupdict()})
+            await handler(scope, receive, send)
+            return
+
+    await receive()
+    await send({"type": "websocket.close", "code": 4404})
@@ -0,0 +1,84 @@
+import re
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Count, Max, Sum
+
+from .models import ChatParticipant, MessageSearchTerm
+
+# Message search. On PostgreSQL messages.search_vector is a generated tsvector
+# column behind a GIN index (migration 0014), so the database keeps it current
+# on every INSERT. Other databases (SQLite in tests) use the MessageSearchTerm
+# inverted index, which the send views fill through index_messages().
+#
+# Both match messages containing every word of the query, case-insensitively,
+# without stemming (the 'simple' configuration; chats mix Polish and English).
+
+TEXT_SEARCH_CONFIG = "simple"
+
+WORD = re.compile(r"\w+")
+
+
+def uses_postgres():
+    return connection.vendor == "postgresql"
+
+
+def tokenize(text):
+    """Lowercased words of `text`, in order, repeated as they occur."""
+    return [word[:MessageSearchTerm.TERM_LENGTH] for word in WORD.findall(text.lower())]
+
+
+def index_messages(messages):
+    """Add new messages to the fallback index; nothing to do on PostgreSQL."""
+    if uses_postgres():
+        return
+
+    MessageSearchTerm.objects.bulk_create([
+        MessageSearchTerm(term=term, message_id_id=message.id, chat_id_id=message.chat_id_id, count=count)
+        for message in messages
+        for term, count in Counter(tokenize(message.content)).items()
+    ])
+
+
+def search_messages(user_id, query, limit, offset):
+    """
+    [(message_id, rank)] of messages in the user's chats containing every word of
+    `query`, best first; newer messages win ties. Empty for a query without words.
+    """
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return []
+    if uses_postgres():
+        return _search_postgres(user_id, " ".join(terms), limit, offset)
+    return _search_fallback(user_id, terms, limit, offset)
+
+
+def _search_postgres(user_id, query, limit, offset):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT m.id, ts_rank(m.search_vector, q.query) AS rank
+            FROM messages m
+            JOIN chat_participants p ON p.chat_id = m.chat_id AND p.user_id = %s,
+                 plainto_tsquery(%s::regconfig, %s) AS q(query)
+            WHERE m.search_vector @@ q.query
+            ORDER BY rank DESC, m.sent_at DESC, m.id DESC
+            LIMIT %s OFFSET %s
+            """,
+            [str(user_id), TEXT_SEARCH_CONFIG, query, limit, offset],
+        )
+        return cursor.fetchall()
+
+
+def _search_fallback(user_id, terms, limit, offset):
+    chat_ids = ChatParticipant.objects.filter(user_id=user_id).values("chat_id")
+    rows = (
+        MessageSearchTerm.objects
+        .filter(term__in=terms, chat_id__in=chat_ids)
+        .values("message_id")
+        .annotate(matched=Count("term", distinct=True), rank=Sum("count"), sent_at=Max("message_id__sent_at"))
+        .filter(matched=len(terms))
+        .order_by("-rank", "-sent_at", "-message_id")
+        .values_list("message_id", "rank")
+    )
+    return list(rows[offset:offset + limit])
@@ -3,7 +3,9 @@ from .models import User
 from .models import Chat
 from .models import ChatParticipant
 from .models import Message
-import hashlib
+from .models import Game
+from .hashers import hash_password
+from . import bitboard, engine
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -15,7 +17,7 @@ class UserSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         password = validated_data.pop('password')
-        validated_data['hashed_password'] = hashlib.sha256(password.encode()).hexdigest()
+        validated_data['hashed_password'] = hash_password(password)
         return super().create(validated_data)
 
 class ChatSerializer(serializers.ModelSerializer):
@@ -38,3 +40,24 @@ class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
         fields = ["id", "chat_id", "sender_id", "sender_email", "content", "sent_at"]
+
+
+
+class GameStateSerializer(serializers.ModelSerializer):
+    # FK ids are read from the *_id attributes so no user rows get loaded
+    game_id = serializers.UUIDField(source="id", read_only=True)
+    player_1 = serializers.CharField(source="player_1_id_id", read_only=True)
+    player_2 = serializers.CharField(source="player_2_id_id", read_only=True)
+    current_turn = serializers.CharField(source="current_turn_id", read_only=True)
+    winner = serializers.CharField(source="winner_id", read_only=True)
+    board = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Game
+        fields = ["game_id", "player_1", "player_2", "player_1_symbol", "player_2_symbol",
+                  "current_turn", "is_finished", "winner", "board_size", "win_length", "board", "round", "version"]
+
+    def get_board(self, game):
+        if game.cells is None:
+            return bitboard.to_fields(game.board_bits)
+        return engine.to_fields(bytes(game.cells))
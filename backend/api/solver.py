@@ -0,0 +1,77 @@
+import threading
+
+from . import bitboard
+
+# Perfect play for every position reachable from the empty board (5478 of
+# them), keyed by the bitboard from api/bitboard.py. X always moves first, so
+# the side to move follows from the number of symbols on the board.
+#
+# Each entry packs score * 16 + best field (0 once the game is over). The
+# score is from the point of view of the side to move: positive wins, negative
+# loses, 0 draws; its size is 1 + empty cells left at the end, so faster wins
+# and slower losses are preferred.
+
+OUTCOMES = {1: "WIN", 0: "DRAW", -1: "LOSS"}
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def build_table():
+    table = {}
+
+    def solve(board):
+        entry = table.get(board)
+        if entry is not None:
+            return entry // 16
+
+        x, o = bitboard.split(board)
+        result = bitboard.winner(board)
+        if result is None:
+            symbol = to_move(board)
+            best_score, best_field = None, 0
+            for field in range(1, bitboard.CELLS + 1):
+                if (x | o) & (1 << (field - 1)):
+                    continue
+                score = -solve(bitboard.place(board, field, symbol))
+                if best_score is None or score > best_score:
+                    best_score, best_field = score, field
+        else:
+            # the previous move ended the game
+            best_field = 0
+            best_score = 0 if result == "DRAW" else -(bitboard.CELLS - bitboard.move_count(board) + 1)
+
+        table[board] = best_score * 16 + best_field
+        return best_score
+
+    solve(0)
+    return table
+
+
+def get_table():
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = build_table()
+    return _table
+
+
+def to_move(board):
+    return "X" if bitboard.move_count(board) % 2 == 0 else "O"
+
+
+def lookup(board):
+    """(score, best field) for the side to move, KeyError for unreachable positions."""
+    return divmod(get_table()[board], 16)
+
+
+def best_move(board):
+    """Best field for the side to move, None once the game is over."""
+    return lookup(board)[1] or None
+
+
+def outcome(board):
+    """"WIN", "DRAW" or "LOSS" with perfect play from both sides."""
+    score = lookup(board)[0]
+    return OUTCOMES[(score > 0) - (score < 0)]
@@ -1,3 +1,781 @@
-from django.test import TestCase
+import hashlib
+import importlib
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import jwt
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import autocomplete, conditional, hashers, realtime, views
+from .authentication import TokenCache
+from .models import Chat, Game, GameMove, InboxEntry, Message, User
+from .ttlcache import TTLCache
 
 # Create your tests here.
+
+
+def make_token(user, expires_in=timedelta(hours=1)):
+    return jwt.encode({
+        "user_id": str(user.id),
+        "email": user.email,
+        "exp": datetime.now(timezone.utc) + expires_in,
+    }, settings.SECRET_KEY, algorithm="HS256")
+
+
+def authenticated_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token(user)}")
+    return client
+
+
+class AuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="me@example.com", hashed_password="x")
+        self.client = APIClient()
+
+    def test_missing_header(self):
+        response = self.client.get("/api/contacts/list/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data, {"error": "Authorization header missing or invalid."})
+
+    def test_expired_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token(self.user, timedelta(seconds=-1))}")
+        response = self.client.get("/api/contacts/list/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data, {"error": "Token expired."})
+
+    def test_malformed_token(self):
+        for header in ["Bearer not-a-token", "Bearer two parts", f"Bearer {make_token(self.user)}x"]:
+            self.client.credentials(HTTP_AUTHORIZATION=header)
+            response = self.client.get("/api/contacts/list/")
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.data, {"error": "Invalid token."})
+
+    def test_cached_claims_expire(self):
+        cache = TokenCache(10)
+        with mock.patch("api.authentication.time.time", return_value=1000):
+            cache.set("token", {"user_id": "u", "exp": 1060})
+            self.assertEqual(cache.get("token"), {"user_id": "u", "exp": 1060})
+        with mock.patch("api.authentication.time.time", return_value=1060):
+            self.assertIsNone(cache.get("token"))
+            cache.set("token", {"user_id": "u", "exp": 1060})
+            self.assertIsNone(cache.get("token"))
+
+    def test_ttl_cache_keeps_recently_used(self):
+        cache = TTLCache(2)
+        with mock.patch("api.ttlcache.time.monotonic", return_value=100):
+            cache.set_many({"a": 1, "b": 2}, 10)
+            cache.get("a")
+            cache.set("c", 3, 5)
+            self.assertEqual(cache.get_many(["a", "b", "c"]), {"a": 1, "c": 3})
+        with mock.patch("api.ttlcache.time.monotonic", return_value=105):
+            self.assertEqual(cache.get_many(["a", "c"]), {"a": 1})
+
+    def test_allow_any_view_without_header(self):
+        response = self.client.get("/api/hello/")
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class PasswordTests(TestCase):
+    legacy_migration = importlib.import_module("api.migrations.0009_wrap_legacy_password_hashes")
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def login(self, email, password):
+        return self.client.post("/api/users/authenticate/", {"email": email, "password": password}, format="json")
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        user = User.objects.create(email="old@example.com", hashed_password=hashlib.sha256(b"secret").hexdigest())
+        self.legacy_migration.wrap_legacy_hashes(apps, None)
+        user.refresh_from_db()
+        self.assertTrue(user.hashed_password.startswith("unsalted_sha256$$"))
+
+        self.assertEqual(self.login("old@example.com", "wrong").status_code, 401)
+        self.assertEqual(self.login("nobody@example.com", "secret").status_code, 401)
+        self.assertEqual(self.login("old@example.com", "secret").status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.hashed_password.startswith("pbkdf2_sha256$"))
+        self.assertEqual(self.login("old@example.com", "secret").status_code, 200)
+
+    def test_unwrap_reverses_the_migration(self):
+        digest = hashlib.sha256(b"secret").hexdigest()
+        user = User.objects.create(email="old@example.com", hashed_password=digest)
+        self.legacy_migration.wrap_legacy_hashes(apps, None)
+        self.legacy_migration.unwrap_legacy_hashes(apps, None)
+        user.refresh_from_db()
+        self.assertEqual(user.hashed_password, digest)
+
+    @override_settings(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_SIZE=0)
+    def test_full_pool_sheds_logins(self):
+        started, release = threading.Event(), threading.Event()
+
+        def hold_slot():
+            started.set()
+            release.wait()
+
+        with mock.patch.object(hashers, "_pool", None), mock.patch.object(hashers, "_pool_slots", None):
+            holder = threading.Thread(target=hashers.run_hashing, args=(hold_slot,))
+            holder.start()
+            try:
+                started.wait()
+                response = self.login("me@example.com", "secret")
+            finally:
+                release.set()
+                holder.join()
+                hashers._pool.shutdown()
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+
+
+class ApiTestCase(TestCase):
+    """Signed in as me@example.com, with helpers to set up chats."""
+
+    def setUp(self):
+        self.user = User.objects.create(email="me@example.com", hashed_password="x")
+        self.client = authenticated_client(self.user)
+
+    def create_chats(self, count):
+        for i in range(count):
+            other = User.objects.create(email=f"other{count}-{i}@example.com", hashed_password="x")
+            chat_id = self.client.post("/api/chats/create-one-on-one/", {
+                "user_id_1": str(self.user.id),
+                "user_id_2": str(other.id),
+            }, format="json").data["chat_id"]
+            self.send(chat_id, other, f"hello {i}")
+
+    def send(self, chat_id, sender, content):
+        response = self.client.post("/api/messages/send/", {
+            "chat_id": str(chat_id),
+            "sender_id": str(sender.id),
+            "content": content,
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/api/chats/user-chats-detailed/{self.user.id}/")
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+
+class UserChatsDetailedTests(ApiTestCase):
+    def test_query_count_does_not_grow_with_chats(self):
+        self.create_chats(1)
+        few_queries, few = self.count_queries()
+
+        self.create_chats(20)
+        many_queries, many = self.count_queries()
+
+        self.assertEqual(len(few), 1)
+        self.assertEqual(len(many), 21)
+        self.assertEqual(few_queries, many_queries)
+
+    def test_last_message_and_unread_count(self):
+        self.create_chats(1)
+        chat = Chat.objects.get()
+        self.send(chat.id, self.user, "my reply")
+
+        _, data = self.count_queries()
+        self.assertEqual(data[0]["last_message_preview"], "my reply")
+        self.assertEqual(data[0]["other_user_email"], "other1-0@example.com")
+        self.assertEqual(data[0]["unread_count"], 1)
+
+        # someone else can't clear it
+        other = chat.participants.exclude(user_id=self.user).get().user_id
+        authenticated_client(other).post(f"/api/chats/{chat.id}/read/", {"user_id": str(self.user.id)}, format="json")
+        _, data = self.count_queries()
+        self.assertEqual(data[0]["unread_count"], 1)
+
+        self.client.post(f"/api/chats/{chat.id}/read/")
+        _, data = self.count_queries()
+        self.assertEqual(data[0]["unread_count"], 0)
+
+
+class OneOnOneChatTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create(email="other@example.com", hashed_password="x")
+
+    def create(self, first, second):
+        return self.client.post("/api/chats/create-one-on-one/", {
+            "user_id_1": str(first.id),
+            "user_id_2": str(second.id),
+        }, format="json")
+
+    def test_same_chat_in_either_order(self):
+        created = self.create(self.user, self.other)
+        self.assertEqual(created.status_code, 201)
+        for first, second in [(self.user, self.other), (self.other, self.user)]:
+            response = self.create(first, second)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["chat_id"], created.data["chat_id"])
+        self.assertEqual(Chat.objects.count(), 1)
+
+    def test_concurrently_created_chat_is_returned(self):
+        chat_id = self.create(self.user, self.other).data["chat_id"]
+        # the lookup misses as if the other request had not committed yet
+        with mock.patch("django.db.models.query.QuerySet.first", return_value=None):
+            response = self.create(self.other, self.user)
+        self.assertEqual((response.status_code, response.data["chat_id"]), (200, chat_id))
+        self.assertEqual(Chat.objects.count(), 1)
+
+
+class MessageHistoryTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_chats(1)
+        self.chat = Chat.objects.get()
+        for i in range(6):
+            self.send(self.chat.id, self.user, f"message {i}")
+        # pages follow seq, the send order, whatever the clocks said
+        self.chat.messages.update(sent_at=datetime(2026, 1, 1, tzinfo=timezone.utc))
+        self.expected = [str(m.id) for m in self.chat.messages.order_by("seq")]
+        self.assertEqual(list(self.chat.messages.order_by("seq").values_list("seq", flat=True)), [1, 2, 3, 4, 5, 6, 7])
+
+    def page(self, **params):
+        response = self.client.get(f"/api/messages/{self.chat.id}/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_before_walks_back_to_the_first_message(self):
+        data = self.page(limit=3)
+        ids = [m["id"] for m in data["messages"]]
+        while data["has_more"]:
+            data = self.page(limit=3, before=data["before"])
+            ids = [m["id"] for m in data["messages"]] + ids
+        self.assertEqual(ids, self.expected)
+
+    def test_after_pages_forward(self):
+        data = self.page(limit=4, after=self.expected[0])
+        self.assertTrue(data["has_more"])
+        ids = [m["id"] for m in data["messages"]]
+        data = self.page(limit=4, after=data["sync_token"])
+        self.assertFalse(data["has_more"])
+        self.assertEqual(ids + [m["id"] for m in data["messages"]], self.expected[1:])
+
+    def test_late_commit_with_earlier_timestamp_is_not_skipped(self):
+        sync_token = self.page()["sync_token"]
+        self.send(self.chat.id, self.user, "late")
+        # as if its sent_at was taken before the last message's, then committed after it
+        self.chat.messages.filter(content="late").update(sent_at=datetime(2025, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual([m["content"] for m in self.page(after=sync_token)["messages"]], ["late"])
+
+    def test_cursor_from_before_seq(self):
+        second = Message.objects.get(id=self.expected[1])
+        legacy = f"{int(second.sent_at.timestamp() * 1000000)}_{second.id.hex}"
+        self.assertEqual([m["id"] for m in self.page(after=legacy)["messages"]], self.expected[2:])
+
+    def test_etag_is_per_page(self):
+        response = self.client.get(f"/api/messages/{self.chat.id}/", {"limit": 3})
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(f"/api/messages/{self.chat.id}/", {"limit": 3},
+                                         HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        for params in [{"limit": 5}, {"limit": 3, "before": response.data["before"]}]:
+            self.assertEqual(self.client.get(f"/api/messages/{self.chat.id}/", params,
+                                             HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_invalid_cursors(self):
+        url = f"/api/messages/{self.chat.id}/"
+        self.assertEqual(self.client.get(url, {"before": "garbage"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"after": "123_nothex"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"after": self.expected[0], "before": self.expected[-1]}).status_code, 400)
+
+
+class MessageSendTests(ApiTestCase):
+    def test_batch_across_chats(self):
+        self.create_chats(2)
+        first, second = InboxEntry.objects.filter(user_id=self.user).order_by("other_user_id__email")
+        stranger = User.objects.create(email="stranger@example.com", hashed_password="x")
+
+        response = self.client.post("/api/messages/send-batch/", {"messages": [
+            {"chat_id": str(first.chat_id_id), "sender_id": str(first.other_user_id_id), "content": "one"},
+            {"chat_id": str(first.chat_id_id), "sender_id": str(first.other_user_id_id), "content": "two"},
+            {"chat_id": str(second.chat_id_id), "sender_id": str(self.user.id), "content": "mine"},
+            {"chat_id": str(second.chat_id_id), "sender_id": str(stranger.id), "content": "intruder"},
+            {"chat_id": str(second.chat_id_id), "content": "no sender"},
+            {"chat_id": str(second.chat_id_id), "sender_id": str(self.user.id), "content": ["x"]},
+            {"chat_id": str(uuid.uuid4()), "sender_id": str(self.user.id), "content": "nowhere"},
+        ]}, format="json")
+
+        self.assertEqual([item["status"] for item in response.data["results"]], [201, 201, 201, 403, 400, 400, 404])
+        self.assertEqual(response.data["results"][2]["message"]["sender_email"], "me@example.com")
+
+        _, data = self.count_queries()
+        chats = {item["chat_id"]: item for item in data}
+        self.assertEqual(chats[str(first.chat_id_id)]["last_message_preview"], "two")
+        self.assertEqual(chats[str(first.chat_id_id)]["unread_count"], 3)
+        self.assertEqual(chats[str(second.chat_id_id)]["last_message_preview"], "mine")
+        self.assertEqual(chats[str(second.chat_id_id)]["unread_count"], 1)
+
+    def test_content_must_be_text(self):
+        self.create_chats(1)
+        chat = Chat.objects.get()
+        for content in [123, ["x"], {"text": "x"}]:
+            response = self.client.post("/api/messages/send/", {
+                "chat_id": str(chat.id), "sender_id": str(self.user.id), "content": content,
+            }, format="json")
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(chat.messages.count(), 1)
+
+    def test_retried_send_is_stored_once(self):
+        self.create_chats(1)
+        chat = Chat.objects.get()
+        body = {"id": str(uuid.uuid4()), "chat_id": str(chat.id), "sender_id": str(self.user.id), "content": "once"}
+
+        first = self.client.post("/api/messages/send/", body, format="json")
+        retry = self.client.post("/api/messages/send/", body, format="json")
+
+        self.assertEqual((first.status_code, retry.status_code), (201, 200))
+        self.assertEqual(retry.data["id"], body["id"])
+        self.assertEqual(chat.messages.count(), 2)
+        self.assertEqual(InboxEntry.objects.get(chat_id=chat, user_id__email="other1-0@example.com").unread_count, 1)
+
+    def test_send_uses_cached_membership(self):
+        self.create_chats(1)
+        chat = Chat.objects.get()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.send(chat.id, self.user, "cached")
+        # the search index table is only written on databases without full-text search
+        statements = [
+            q["sql"].split()[0] for q in queries
+            if "SAVEPOINT" not in q["sql"] and "message_search_terms" not in q["sql"]
+        ]
+        # lock the chat and read the seq, insert, update the inbox
+        self.assertEqual(statements, ["UPDATE", "SELECT", "INSERT", "UPDATE"])
+
+
+class MessageSearchTests(ApiTestCase):
+    def test_search_ranks_and_scopes_to_own_chats(self):
+        self.create_chats(2)
+        first, second = Chat.objects.order_by("created_at")
+        other = first.participants.exclude(user_id=self.user).get().user_id
+        self.send(first.id, self.user, "Pizza tonight?")
+        self.send(first.id, other, "pizza pizza, sure tonight")
+        self.send(second.id, self.user, "no pizza for me")
+
+        stranger = User.objects.create(email="stranger@example.com", hashed_password="x")
+        elsewhere = Chat.objects.create()
+        elsewhere.participants.create(user_id=stranger)
+        self.send(elsewhere.id, stranger, "pizza tonight")
+
+        response = self.client.get("/api/messages/search/", {"q": "TONIGHT pizza"})
+        self.assertEqual([m["content"] for m in response.data["results"]], ["pizza pizza, sure tonight", "Pizza tonight?"])
+
+        response = self.client.get("/api/messages/search/", {"q": "pizza", "limit": 2})
+        self.assertTrue(response.data["has_more"])
+        response = self.client.get("/api/messages/search/", {"q": "pizza", "limit": 2, "offset": 2})
+        self.assertEqual([m["content"] for m in response.data["results"]], ["Pizza tonight?"])
+
+
+class ContactTests(ApiTestCase):
+    def test_tags_change_with_a_contact_email(self):
+        self.create_chats(1)
+        chat = Chat.objects.get()
+        other = chat.participants.exclude(user_id=self.user).get().user_id
+        self.client.post("/api/contacts/add/", {"email": other.email}, format="json")
+        urls = ["/api/contacts/list/", f"/api/chats/user-chats-detailed/{self.user.id}/", f"/api/messages/{chat.id}/"]
+        etags = [self.client.get(url)["ETag"] for url in urls]
+
+        self.client.post("/api/users/change_email/", {"id": str(other.id), "new_email": "renamed@example.com"}, format="json")
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertIn("renamed@example.com", json.dumps(response.data, default=str))
+
+    def test_contact_search_skips_contacts(self):
+        autocomplete.hot_prefixes.clear()
+        for email in ["Ann@example.com", "anna@example.com", "andrew@example.com", "bob@example.com"]:
+            User.objects.create(email=email, hashed_password="x")
+        self.client.post("/api/contacts/add/", {"email": "anna@example.com"}, format="json")
+
+        for prefix in ["a", "AN", "ann"]:
+            response = self.client.get("/api/contacts/search/", {"q": prefix})
+            emails = [user["email"] for user in response.data["results"]]
+            self.assertNotIn("anna@example.com", emails)
+            self.assertIn("Ann@example.com", emails)
+            self.assertNotIn("bob@example.com", emails)
+
+    def test_import_reports_each_email(self):
+        User.objects.create(email="known@example.com", hashed_password="x")
+        response = self.client.post("/api/contacts/import/", {
+            "emails": ["known@example.com", " known@example.com", {"x": 1}, ["y"], "", "me@example.com", "nobody@example.com"],
+        }, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["status"] for item in response.data["results"]],
+                         ["added", "invalid", "invalid", "invalid", "self", "not_found"])
+        self.assertEqual(response.data["added"], 1)
+
+    def test_add_for_deleted_user(self):
+        User.objects.create(email="known@example.com", hashed_password="x")
+        self.user.delete()
+        response = self.client.post("/api/contacts/add/", {"email": "known@example.com"}, format="json")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data, {"error": "Authenticated user not found."})
+
+    def test_import_for_deleted_user(self):
+        User.objects.create(email="known@example.com", hashed_password="x")
+        self.user.delete()
+        response = self.client.post("/api/contacts/import/", {"emails": ["known@example.com"]}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_contacts_list_pages(self):
+        for email in ["c1@example.com", "c2@example.com", "c3@example.com"]:
+            User.objects.create(email=email, hashed_password="x")
+        self.client.post("/api/contacts/import/", {
+            "emails": ["c1@example.com", "c2@example.com", "c3@example.com"],
+        }, format="json")
+
+        emails, cursor = [], None
+        while True:
+            params = {"limit": 2, "fields": "email"}
+            if cursor:
+                params["cursor"] = cursor
+            data = self.client.get("/api/contacts/list/", params).data
+            self.assertTrue(all(contact.keys() == {"email"} for contact in data["contacts"]))
+            emails += [contact["email"] for contact in data["contacts"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(sorted(emails), ["c1@example.com", "c2@example.com", "c3@example.com"])
+        self.assertEqual(len(emails), 3)
+
+        self.assertEqual(self.client.get("/api/contacts/list/", {"fields": "password"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/contacts/list/", {"cursor": "nope"}).status_code, 400)
+
+
+class PresenceTests(ApiTestCase):
+    def test_presence_and_typing(self):
+        online = User.objects.create(email="online@example.com", hashed_password="x")
+        away = User.objects.create(email="away@example.com", hashed_password="x")
+        self.client.post("/api/contacts/import/", {"emails": [online.email, away.email]}, format="json")
+        chat_id = self.client.post("/api/chats/create-one-on-one/", {
+            "user_id_1": str(self.user.id),
+            "user_id_2": str(online.id),
+        }, format="json").data["chat_id"]
+
+        self.assertEqual(self.client.post("/api/users/heartbeat/").status_code, 204)
+        with self.assertNumQueries(1):
+            contacts = self.client.get("/api/contacts/presence/").data["contacts"]
+        self.assertEqual({contact["id"]: contact["online"] for contact in contacts},
+                         {str(online.id): False, str(away.id): False})
+
+        frames = []
+        realtime.get_broker().subscribe(realtime.chat_channel(chat_id), frames.append)
+        try:
+            # the member list is loaded once, then served from the membership cache
+            with self.assertNumQueries(1):
+                for _ in range(3):
+                    self.assertEqual(self.client.post(f"/api/chats/{chat_id}/typing/").status_code, 204)
+            self.client.post(f"/api/chats/{chat_id}/typing/", {"typing": False}, format="json")
+        finally:
+            realtime.get_broker().unsubscribe(realtime.chat_channel(chat_id), frames.append)
+        # repeats within the typing TTL are not announced again
+        self.assertEqual([json.loads(frame)["typing"] for frame in frames], [True, False])
+
+        other_chat = self.client.post("/api/chats/create-one-on-one/", {
+            "user_id_1": str(online.id),
+            "user_id_2": str(away.id),
+        }, format="json").data["chat_id"]
+        self.assertEqual(self.client.post(f"/api/chats/{other_chat}/typing/").status_code, 403)
+
+    def test_typing_does_not_end_long_polls(self):
+        channel = realtime.chat_channel(uuid.uuid4())
+        request = RequestFactory().get("/", {"wait": "0.3"}, HTTP_IF_NONE_MATCH='"1"')
+        etags = ['"1"', '"1"', '"2"']
+
+        def typing():
+            realtime.publish(channel, {"type": "typing"})
+
+        # unchanged ETag after the publish: parked until the timeout
+        timer = threading.Timer(0.05, typing)
+        timer.start()
+        started = time.monotonic()
+        _, response = conditional.not_modified(request, lambda: '"1"', channel)
+        timer.join()
+        self.assertEqual(response.status_code, 304)
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+
+        # the ETag changes with the second publish
+        timers = [threading.Timer(delay, typing) for delay in (0.05, 0.1)]
+        for timer in timers:
+            timer.start()
+        etag, response = conditional.not_modified(request, lambda: etags.pop(0), channel)
+        for timer in timers:
+            timer.join()
+        self.assertEqual((etag, response), ('"2"', None))
+
+
+class GameHistoryTests(TestCase):
+    def setUp(self):
+        self.x = User.objects.create(email="x@example.com", hashed_password="x")
+        self.o = User.objects.create(email="o@example.com", hashed_password="x")
+        self.client = authenticated_client(self.x)
+        self.game_id = self.client.post("/api/game/create", {
+            "player_1_id": str(self.x.id),
+            "player_2_id": str(self.o.id),
+        }, format="json").data["game_id"]
+
+    def play(self, *fields):
+        players = [self.x, self.o]
+        for i, field in enumerate(fields):
+            response = self.client.post("/api/game/move", {
+                "game_id": str(self.game_id),
+                "player_id": str(players[i % 2].id),
+                "field": field,
+            }, format="json")
+            self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_rounds_are_logged_and_counted(self):
+        self.assertEqual(self.play(1, 4, 2, 5, 3)["status"], "WIN")
+        self.client.post("/api/game/restart", {"game_id": str(self.game_id)}, format="json")
+        self.assertEqual(self.play(1, 2, 3, 5, 4, 6, 8, 7, 9)["status"], "DRAW")
+
+        moves = self.client.get("/api/game/moves", {"game_id": str(self.game_id), "round": 1}).data
+        self.assertEqual([move["field"] for move in moves["moves"]], [1, 4, 2, 5, 3])
+        self.assertEqual([move["move_index"] for move in moves["moves"]], [1, 2, 3, 4, 5])
+        self.assertEqual(len(self.client.get("/api/game/moves", {"game_id": str(self.game_id)}).data["moves"]), 9)
+
+        stats = self.client.get("/api/game/stats", {
+            "player_1_id": str(self.o.id),
+            "player_2_id": str(self.x.id),
+        }).data
+        self.assertEqual(stats["wins"], {str(self.x.id): 1, str(self.o.id): 0})
+        self.assertEqual(stats["draws"], 1)
+        self.assertEqual(stats["rounds_finished"], 2)
+
+    def test_same_game_in_either_order(self):
+        for first, second in [(self.x, self.o), (self.o, self.x)]:
+            response = self.client.post("/api/game/create", {
+                "player_1_id": str(first.id),
+                "player_2_id": str(second.id),
+            }, format="json")
+            self.assertEqual((response.status_code, str(response.data["game_id"])), (200, str(self.game_id)))
+
+        # the lookup misses as if the other request had not committed yet
+        with mock.patch("django.db.models.query.QuerySet.first", return_value=None):
+            response = self.client.post("/api/game/create", {
+                "player_1_id": str(self.o.id),
+                "player_2_id": str(self.x.id),
+            }, format="json")
+        self.assertEqual((response.status_code, str(response.data["game_id"])), (200, str(self.game_id)))
+        self.assertEqual(Game.objects.count(), 1)
+
+    def test_stale_game_is_not_overwritten(self):
+        stale = Game.objects.get(id=self.game_id)
+        self.play(1)  # the copy above is now one version behind
+        current = Game.objects.get(id=self.game_id)
+
+        with transaction.atomic():
+            self.assertFalse(views.play_move(stale, self.x.id, 9))
+        game = Game.objects.get(id=self.game_id)
+        self.assertEqual((game.board_bits, game.version), (current.board_bits, current.version))
+        self.assertEqual(GameMove.objects.filter(game_id=game).count(), 1)
+
+    def test_server_opponent_draws_against_hints(self):
+        game_id = self.client.post("/api/game/create-vs-server", {
+            "player_id": str(self.x.id),
+        }, format="json").data["game_id"]
+
+        while True:
+            hint = self.client.get("/api/game/hint", {"game_id": str(game_id)}).data
+            self.assertEqual(hint["outcome"], "DRAW")
+            result = self.client.post("/api/game/move", {
+                "game_id": str(game_id),
+                "player_id": str(self.x.id),
+                "field": hint["field"],
+            }, format="json").data
+            if result["status"] != "OK":
+                break
+            self.assertIn("server_move", result)
+
+        self.assertEqual(result["status"], "DRAW")
+        self.assertEqual(len(self.client.get("/api/game/moves", {"game_id": str(game_id)}).data["moves"]), 9)
+
+    def test_server_turn_needs_no_query(self):
+        game_id = self.client.post("/api/game/create-vs-server", {
+            "player_id": str(self.x.id),
+        }, format="json").data["game_id"]
+        game = Game.objects.get(id=game_id)
+        self.assertTrue(game.vs_server)
+        self.assertFalse(Game.objects.get(id=self.game_id).vs_server)
+
+        game.current_turn_id = game.player_1_id_id
+        with self.assertNumQueries(0):
+            self.assertIsNone(views.play_server_turn(game))
+
+    def test_server_only_plays_the_classic_board(self):
+        server = views.get_server_player()
+        response = self.client.post("/api/game/create", {
+            "player_1_id": str(server.id),
+            "player_2_id": str(self.x.id),
+            "board_size": 15,
+            "win_length": 5,
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post("/api/game/create", {
+            "player_1_id": str(server.id),
+            "player_2_id": str(self.x.id),
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        game = Game.objects.get(id=response.data["game_id"])
+        self.assertEqual((game.player_1_id_id, game.player_2_id_id, game.vs_server), (self.x.id, server.id, True))
+
+    def test_server_email_is_reserved(self):
+        email = settings.GAME_SERVER_PLAYER_EMAIL.upper()
+        response = self.client.post("/api/users/create/", {"email": email, "password": "secret123"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/users/change_email/", {"id": str(self.o.id), "new_email": email}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.filter(email__iexact=email).exists())
+
+    def test_larger_board_variant(self):
+        self.client.post("/api/game/restart", {
+            "game_id": str(self.game_id),
+            "board_size": 15,
+            "win_length": 5,
+        }, format="json")
+
+        # X fills the anti-diagonal from the top-right corner, O plays the first column
+        x_fields = [15 + 14 * i for i in range(5)]
+        o_fields = [1 + 15 * i for i in range(4)]
+        fields = [f for pair in zip(x_fields, o_fields) for f in pair] + [x_fields[-1]]
+        result = self.play(*fields)
+        self.assertEqual(result["status"], "WIN")
+        self.assertEqual(result["winner"], "X")
+
+        state = self.client.get("/api/game/", {
+            "player_1_id": str(self.x.id),
+            "player_2_id": str(self.o.id),
+        }).data
+        self.assertEqual((state["board_size"], state["win_length"]), (15, 5))
+        self.assertEqual(len(state["board"]), 225)
+        self.assertEqual(state["board"]["field_71"], "X")
+
+    def test_full_larger_board_is_a_draw(self):
+        self.client.post("/api/game/restart", {
+            "game_id": str(self.game_id),
+            "board_size": 4,
+            "win_length": 4,
+        }, format="json")
+
+        # rows XXOO / OOXX / XXOO / OOXX, no line of four anywhere
+        x_fields = [1, 2, 7, 8, 9, 10, 15, 16]
+        o_fields = [3, 4, 5, 6, 11, 12, 13, 14]
+        result = self.play(*[f for pair in zip(x_fields, o_fields) for f in pair])
+        self.assertEqual(result["status"], "DRAW")
+
+        moves = self.client.get("/api/game/moves", {"game_id": str(self.game_id), "round": 2}).data["moves"]
+        self.assertEqual([move["move_index"] for move in moves], list(range(1, 17)))
+
+
+class SocketTests(TransactionTestCase):
+    # committed data: the socket code reads the database from other threads
+
+    def setUp(self):
+        self.user = User.objects.create(email="me@example.com", hashed_password="x")
+        self.other = User.objects.create(email="other@example.com", hashed_password="x")
+        self.client = authenticated_client(self.user)
+        self.chat_id = self.client.post("/api/chats/create-one-on-one/", {
+            "user_id_1": str(self.user.id),
+            "user_id_2": str(self.other.id),
+        }, format="json").data["chat_id"]
+
+    async def connect(self, path, token):
+        communicator = ApplicationCommunicator(realtime.websocket_application, {
+            "type": "websocket",
+            "path": path,
+            "headers": [(b"authorization", f"Bearer {token}".encode())],
+            "query_string": b"",
+        })
+        await communicator.send_input({"type": "websocket.connect"})
+        return communicator, await communicator.receive_output(5)
+
+    async def disconnect(self, communicator):
+        await communicator.send_input({"type": "websocket.disconnect"})
+        await communicator.wait(5)
+
+    async def receive_json(self, communicator):
+        event = await communicator.receive_output(5)
+        self.assertEqual(event["type"], "websocket.send")
+        return json.loads(event["text"])
+
+    async def test_bad_token_is_refused(self):
+        communicator, event = await self.connect("/ws/chat/", "not-a-token")
+        self.assertEqual(event, {"type": "websocket.close", "code": 4401})
+        await communicator.wait(5)
+
+    async def test_sent_message_is_pushed(self):
+        communicator, event = await self.connect("/ws/chat/", make_token(self.other))
+        self.assertEqual(event, {"type": "websocket.accept"})
+
+        await sync_to_async(self.client.post)("/api/messages/send/", {
+            "chat_id": self.chat_id, "sender_id": str(self.user.id), "content": "over the socket",
+        }, format="json")
+        frame = await self.receive_json(communicator)
+        self.assertEqual((frame["type"], frame["message"]["content"]), ("message", "over the socket"))
+        await self.disconnect(communicator)
+
+    async def test_slow_client_is_disconnected(self):
+        communicator, _ = await self.connect("/ws/chat/", make_token(self.other))
+        # published faster than the socket can take them, the queue overflows
+        for i in range(realtime.SUBSCRIPTION_QUEUE_SIZE + 1):
+            realtime.publish(realtime.chat_channel(self.chat_id), {"type": "message", "n": i})
+
+        while True:
+            event = await communicator.receive_output(5)
+            if event["type"] == "websocket.close":
+                break
+        self.assertEqual(event["code"], 4008)
+        await self.disconnect(communicator)
+
+    async def test_game_socket_is_for_players_only(self):
+        stranger = await sync_to_async(User.objects.create)(email="stranger@example.com", hashed_password="x")
+        game_id = (await sync_to_async(self.client.post)("/api/game/create", {
+            "player_1_id": str(self.user.id),
+            "player_2_id": str(self.other.id),
+        }, format="json")).data["game_id"]
+
+        communicator, event = await self.connect(f"/ws/game/{game_id}/", make_token(stranger))
+        self.assertEqual(event, {"type": "websocket.close", "code": 4403})
+        await communicator.wait(5)
+
+    async def test_game_state_is_pushed(self):
+        game_id = (await sync_to_async(self.client.post)("/api/game/create", {
+            "player_1_id": str(self.user.id),
+            "player_2_id": str(self.other.id),
+        }, format="json")).data["game_id"]
+
+        communicator, event = await self.connect(f"/ws/game/{game_id}/", make_token(self.other))
+        self.assertEqual(event, {"type": "websocket.accept"})
+        frame = await self.receive_json(communicator)
+        self.assertEqual(frame["type"], "game")
+        self.assertEqual(frame["game"]["board"]["field_5"], "EMPTY")
+
+        await sync_to_async(self.client.post)("/api/game/move", {
+            "game_id": game_id, "player_id": str(self.user.id), "field": 5,
+        }, format="json")
+        frame = await self.receive_json(communicator)
+        self.assertEqual(frame["game"]["board"]["field_5"], "X")
+
+        await sync_to_async(self.client.post)("/api/game/restart", {"game_id": game_id}, format="json")
+        frame = await self.receive_json(communicator)
+        self.assertEqual((frame["game"]["board"]["field_5"], frame["game"]["round"]), ("EMPTY", 2))
+        await self.disconnect(communicator)
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+
+# The per-process cache behind the membership and presence stores, the
+# autocomplete hot prefixes and the verified token cache. It has the part of
+# Django's cache API those use (get, get_many, set, set_many, delete,
+# delete_many, clear), so code written against it also runs on caches[alias]
+# when a shared cache is configured.
+
+
+class TTLCache:
+    """Bounded LRU in this process, each entry expiring `timeout` seconds after it was set."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def now(self):
+        return time.monotonic()
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys):
+        """The entries found, missing and expired keys are left out."""
+        found = {}
+        now = self.now()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                value, expires_at = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set(self, key, value, timeout):
+        self.set_many({key: value}, timeout)
+
+    def set_many(self, mapping, timeout):
+        if self.maxsize <= 0:
+            return
+        expires_at = self.now() + timeout
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -12,24 +12,36 @@ urlpatterns = [
     path('users/delete/', views.delete_user),
     path('users/change_email/', views.change_email),
     path('users/change_password/', views.change_password),
+    path('users/heartbeat/', views.heartbeat),
 
     # CONTACTS
     path('contacts/add/', views.add_contact),
     path('contacts/list/', views.get_contacts_list),
+    path('contacts/search/', views.search_contacts),
+    path('contacts/import/', views.import_contacts),
+    path('contacts/presence/', views.get_contacts_presence),
 
     # CHATS
     path('chats/create-one-on-one/', views.create_or_get_chat_between_users),
     path('chats/user-chats/<uuid:user_id>/', views.get_user_chats),
     path('chats/user-chats-detailed/<user_id>/', views.get_user_chats_detailed),
+    path('chats/<uuid:chat_id>/read/', views.mark_chat_read),
+    path('chats/<uuid:chat_id>/typing/', views.set_typing),
 
     # MESSAGES
+    path('messages/search/', views.search_messages),
     path('messages/<uuid:chat_id>/', views.get_messages),
     path('messages/send/', views.send_message),
+    path('messages/send-batch/', views.send_messages_batch),
 
     # GAMES
     path('game/create', views.create_game),
+    path('game/create-vs-server', views.create_game_vs_server),
     path('game/', views.get_game),
     path('game/move', views.make_move),
     path('game/restart', views.restart_game),
+    path('game/moves', views.get_game_moves),
+    path('game/stats', views.get_game_stats),
+    path('game/hint', views.get_game_hint),
 
 ]
@@ -5,55 +5,83 @@ from django.utils import timezone
 from .models import User
 from .models import Contact
 from .serializers import UserSerializer
-import hashlib
+from .hashers import HashingPoolSaturated, hash_password, verify_password
 from .models import Chat
+from .models import pair_key
 from .serializers import ChatSerializer
 from .models import ChatParticipant
+from .models import InboxEntry
 from .serializers import ChatParticipantSerializer
 from .models import Message
 from .serializers import MessageSerializer
 import jwt
 from django.conf import settings
+from rest_framework.decorators import permission_classes
+from rest_framework.permissions import AllowAny
 from datetime import datetime, timedelta
-
-from django.db.models import Count
-
-
-def require_auth(request):
-
-
-    auth_header = request.headers.get("Authorization", "")
-
-    if not auth_header.startswith("Bearer "):
-        return Response({"error": "Authorization header missing or invalid."},
-                        status=status.HTTP_401_UNAUTHORIZED)
-
-    token = auth_header.split(" ")[1]
-
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        return payload
-
-    except jwt.ExpiredSignatureError:
-        return Response({"error": "Token expired."},
-                        status=status.HTTP_401_UNAUTHORIZED)
-
-    except jwt.InvalidTokenError:
-        return Response({"error": "Invalid token."},
-                        status=status.HTTP_401_UNAUTHORIZED)
+import uuid
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Max, PositiveBigIntegerField, Q, Sum, Value, When
+from . import autocomplete, membership, presence, realtime, search
+from .conditional import make_etag, not_modified
+from .cursors import (
+    MESSAGE_CURSOR_START, InvalidCursor, contact_cursor, decode_contact_cursor, decode_legacy_message_cursor,
+    decode_message_cursor, message_cursor,
+)
+
+MESSAGE_PAGE_SIZE = 50
+MESSAGE_PAGE_SIZE_MAX = 200
+MESSAGE_BATCH_MAX = 100
+SEARCH_PAGE_SIZE = 20
+SEARCH_PAGE_SIZE_MAX = 100
+SEARCH_MAX_OFFSET = 1000
+CONTACT_SEARCH_SIZE = 10
+CONTACT_SEARCH_SIZE_MAX = 50
+CONTACT_IMPORT_MAX = 5000
+CONTACTS_PAGE_SIZE = 100
+CONTACTS_PAGE_SIZE_MAX = 500
+# fields= of the contacts list, read from Contact.values() rows
+CONTACT_FIELDS = {
+    "id": lambda row: str(row["contact_id"]),
+    "email": lambda row: row["contact_id__email"],
+    "added_at": lambda row: row["created_at"],
+}
+
+
+def auth_busy():
+    return Response({"error": "Too many authentication requests, try again shortly."},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={"Retry-After": "1"})
 
 
 @api_view(['GET'])
+@permission_classes([AllowAny])
 def hello(request):
     return Response({"message": "Hello from DRF API!"})
 
 #USERS
 
+def is_reserved_email(email):
+    # the server player's account (get_server_player) is found by this address
+    return str(email).strip().lower() == settings.GAME_SERVER_PLAYER_EMAIL.lower()
+
+
+def reserved_email():
+    return Response({"error": "This email address is reserved."}, status=status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['POST'])
+@permission_classes([AllowAny])
 def create_user(request):
+    if is_reserved_email(request.data.get("email", "")):
+        return reserved_email()
     serializer = UserSerializer(data=request.data)
     if serializer.is_valid():
-        user = serializer.save(created_at=timezone.now(), updated_at=timezone.now())
+        try:
+            user = serializer.save(created_at=timezone.now(), updated_at=timezone.now())
+        except HashingPoolSaturated:
+            return auth_busy()
         return Response({
             "id": str(user.id),
             "email": user.email,
@@ -63,6 +91,7 @@ def create_user(request):
 
 
 @api_view(['POST'])
+@permission_classes([AllowAny])
 def authenticate_user(request):
     email = request.data.get("email")
     password = request.data.get("password")
@@ -71,14 +100,14 @@ def authenticate_user(request):
         return Response({"error": "Email and password are required."},
                         status=status.HTTP_400_BAD_REQUEST)
 
+    user = User.objects.filter(email=email).first()
+
     try:
-        user = User.objects.get(email=email)
-    except User.DoesNotExist:
-        return Response({"error": "Invalid email or password."},
-                        status=status.HTTP_401_UNAUTHORIZED)
+        is_valid = verify_password(user, password)
+    except HashingPoolSaturated:
+        return auth_busy()
 
-    hashed_password = hashlib.sha256(password.encode()).hexdigest()
-    if hashed_password != user.hashed_password:
+    if not is_valid:
         return Response({"error": "Invalid email or password."},
                         status=status.HTTP_401_UNAUTHORIZED)
 
@@ -128,12 +157,15 @@ def change_email(request):
     except User.DoesNotExist:
         return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
+    if is_reserved_email(new_email):
+        return reserved_email()
     if User.objects.filter(email=new_email).exists():
         return Response({"error": "Email already in use."}, status=status.HTTP_400_BAD_REQUEST)
 
     user.email = new_email
     user.updated_at = timezone.now()
     user.save()
+    membership.invalidate_user(user.id)
     return Response({"message": "Email updated successfully.", "id": str(user.id), "new_email": user.email})
 
 
@@ -151,11 +183,13 @@ def change_password(request):
     except User.DoesNotExist:
         return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
-    hashed_old = hashlib.sha256(old_password.encode()).hexdigest()
-    if hashed_old != user.hashed_password:
-        return Response({"error": "Old password is incorrect."}, status=status.HTTP_401_UNAUTHORIZED)
+    try:
+        if not verify_password(user, old_password):
+            return Response({"error": "Old password is incorrect."}, status=status.HTTP_401_UNAUTHORIZED)
 
-    user.hashed_password = hashlib.sha256(new_password.encode()).hexdigest()
+        user.hashed_password = hash_password(new_password)
+    except HashingPoolSaturated:
+        return auth_busy()
     user.updated_at = timezone.now()
     user.save()
     return Response({"message": "Password updated successfully."})
@@ -164,24 +198,14 @@ def change_password(request):
 #CONTACTS
 @api_view(['POST'])
 def add_contact(request):
-    auth = require_auth(request)
-    if isinstance(auth, Response):
-        return auth
-
-    user_id = auth["user_id"]
+    user_id = request.user.id
     contact_email = request.data.get("email")
 
     if not contact_email:
         return Response({"error": "email is required."},
                         status=status.HTTP_400_BAD_REQUEST)
 
-
-    try:
-        user = User.objects.get(id=user_id)
-        if user.email == contact_email:
-            return Response({"error": "You cannot add yourself as a contact."},
-                            status=status.HTTP_400_BAD_REQUEST)
-    except User.DoesNotExist:
+    if request.user.instance is None:
         return Response({"error": "Authenticated user not found."},
                         status=status.HTTP_404_NOT_FOUND)
 
@@ -192,6 +216,10 @@ def add_contact(request):
         return Response({"error": "User with this email does not exist."},
                         status=status.HTTP_404_NOT_FOUND)
 
+    if str(contact_user.id) == user_id:
+        return Response({"error": "You cannot add yourself as a contact."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
 
     if Contact.objects.filter(user_id=user_id, contact_id=contact_user.id).exists():
         return Response({"message": "Contact already added."},
@@ -214,28 +242,156 @@ def delete_contact(request):
     #TODO
     pass
 
+@api_view(['POST'])
+def import_contacts(request):
+    """
+    Add many contacts by email at once (address book sync). Answers with a status
+    per distinct email, in request order: added, already_added, not_found, self
+    or invalid.
+    """
+    user_id = request.user.id
+    emails = request.data.get("emails")
+
+    if not isinstance(emails, list) or not emails:
+        return Response({"error": "emails must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(emails) > CONTACT_IMPORT_MAX:
+        return Response({"error": f"At most {CONTACT_IMPORT_MAX} emails per request."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    # only strings are de-duplicated, anything else is reported as invalid as is
+    seen = set()
+    items = []
+    for email in emails:
+        if isinstance(email, str):
+            email = email.strip()
+            if email in seen:
+                continue
+            seen.add(email)
+        items.append(email)
+    valid = [email for email in items if isinstance(email, str) and email]
+
+    users = dict(User.objects.filter(email__in=valid).values_list("email", "id"))
+    existing = set(
+        Contact.objects.filter(user_id=user_id, contact_id__in=users.values()).values_list("contact_id", flat=True)
+    )
+
+    results = []
+    new_contacts = []
+    for email in items:
+        if not isinstance(email, str) or not email:
+            results.append({"email": email, "status": "invalid"})
+            continue
+
+        contact_id = users.get(email)
+        if contact_id is None:
+            status_name = "not_found"
+        elif str(contact_id) == str(user_id):
+            status_name = "self"
+        elif contact_id in existing:
+            status_name = "already_added"
+        else:
+            status_name = "added"
+            new_contacts.append(Contact(user_id_id=user_id, contact_id_id=contact_id))
+        results.append({"email": email, "status": status_name, "contact_id": contact_id})
+
+    # the token may outlive its user, whose contacts would fail the foreign key
+    if new_contacts and request.user.instance is None:
+        return Response({"error": "Authenticated user not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    # a concurrent add of the same contact is skipped by the unique constraint
+    Contact.objects.bulk_create(new_contacts, ignore_conflicts=True)
+
+    return Response({"results": results, "added": len(new_contacts)}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def search_contacts(request):
+    """Type-ahead for adding contacts: users whose email starts with ?q=, minus existing contacts."""
+    prefix = request.GET.get("q", "").strip()
+    if not prefix:
+        return Response({"error": "q is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = _page_size(request, CONTACT_SEARCH_SIZE, CONTACT_SEARCH_SIZE_MAX)
+    except ValueError:
+        return Response({"error": f"limit must be between 1 and {CONTACT_SEARCH_SIZE_MAX}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({"results": autocomplete.suggest(request.user.id, prefix, limit)}, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def heartbeat(request):
+    """Marks the caller online for PRESENCE_TIMEOUT seconds; nothing is written to the database."""
+    presence.heartbeat(request.user.id)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['GET'])
+def get_contacts_presence(request):
+    """Online status and last heartbeat of all the caller's contacts."""
+    return Response({"contacts": presence.contacts_presence(request.user.id)}, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 def get_contacts_list(request):
-    auth = require_auth(request)
-    if isinstance(auth, Response):
-        return auth
+    user_id = request.user.id
 
-    user_id = auth["user_id"]
+    fields = request.GET.get("fields")
+    fields = fields.split(",") if fields else list(CONTACT_FIELDS)
+    if not fields or any(field not in CONTACT_FIELDS for field in fields):
+        return Response({"error": f"fields must be a comma-separated subset of {', '.join(CONTACT_FIELDS)}."},
+                        status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        limit = _page_size(request, CONTACTS_PAGE_SIZE, CONTACTS_PAGE_SIZE_MAX)
+    except ValueError:
+        return Response({"error": f"limit must be between 1 and {CONTACTS_PAGE_SIZE_MAX}"},
+                        status=status.HTTP_400_BAD_REQUEST)
 
-    contacts = Contact.objects.filter(user_id=user_id).select_related("contact_id")
+    cursor = request.GET.get("cursor")
+    contacts = Contact.objects.filter(user_id=user_id)
+    if cursor:
+        try:
+            created_at, email = decode_contact_cursor(cursor)
+        except InvalidCursor:
+            return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        contacts = contacts.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, contact_id__email__gt=email)
+        )
 
+    def contacts_etag():
+        # users.updated_at moves to "now" on every change, so an email change raises the max
+        state = Contact.objects.filter(user_id=user_id).aggregate(
+            count=Count("id"), last=Max("created_at"), changed=Max("contact_id__updated_at")
+        )
+        # one tag per page and field set
+        return make_etag("contacts", user_id, state["count"], _timestamp(state["last"]), _timestamp(state["changed"]),
+                         limit, cursor or "", ".".join(fields))
+
+    etag, response = not_modified(request, contacts_etag)
+    if response is not None:
+        return response
+
+    # plain rows, oldest contact first
+    rows = list(
+        contacts
+        .order_by("created_at", "contact_id__email")
+        .values("contact_id", "contact_id__email", "created_at")[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
 
     contact_list = [
-        {
-            "id": str(c.contact_id.id),
-            "email": c.contact_id.email,
-            "added_at": c.created_at
-        }
-        for c in contacts
+        {field: CONTACT_FIELDS[field](row) for field in fields}
+        for row in rows
     ]
 
-    return Response({"contacts": contact_list}, status=status.HTTP_200_OK)
+    return Response({
+        "contacts": contact_list,
+        "next_cursor": contact_cursor(rows[-1]["created_at"], rows[-1]["contact_id__email"]) if has_more else None,
+    }, status=status.HTTP_200_OK, headers={"ETag": etag})
 
 
 # CHAT
@@ -276,6 +432,15 @@ def add_chat_participant(request):
     if not created:
         return Response({"error": "User is already in this chat"}, status=409)
 
+    other = ChatParticipant.objects.filter(chat_id=chat).exclude(user_id=user).values_list("user_id", flat=True).first()
+    InboxEntry.objects.create(
+        user_id=user,
+        chat_id=chat,
+        other_user_id_id=other,
+        last_activity_at=chat.created_at
+    )
+    InboxEntry.objects.filter(chat_id=chat, other_user_id__isnull=True).exclude(user_id=user).update(other_user_id=user)
+
     return Response(serializer.data, status=201)
 
 
@@ -304,20 +469,13 @@ def create_or_get_chat_between_users(request):
     if user_id_1 == user_id_2:
         return Response({"error": "Cannot create chat with the same user twice"}, status=400)
 
-    try:
-        user1 = User.objects.get(id=user_id_1)
-        user2 = User.objects.get(id=user_id_2)
-    except User.DoesNotExist:
+    users = User.objects.in_bulk([user_id_1, user_id_2])
+    if len(users) != 2:
         return Response({"error": "One of the users does not exist"}, status=404)
+    user1, user2 = users[uuid.UUID(str(user_id_1))], users[uuid.UUID(str(user_id_2))]
 
-
-    chats_user1 = ChatParticipant.objects.filter(user_id=user1).values_list("chat_id", flat=True)
-
-
-    existing_chat = ChatParticipant.objects.filter(
-        chat_id__in=chats_user1,
-        user_id=user2
-    ).values_list("chat_id", flat=True).first()
+    key = pair_key(user1.id, user2.id)
+    existing_chat = Chat.objects.filter(direct_key=key).values_list("id", flat=True).first()
 
     if existing_chat:
         return Response({
@@ -326,11 +484,27 @@ def create_or_get_chat_between_users(request):
             "created": False
         }, status=200)
 
-
-    chat = Chat.objects.create()
-
-    ChatParticipant.objects.create(chat_id=chat, user_id=user1)
-    ChatParticipant.objects.create(chat_id=chat, user_id=user2)
+    try:
+        with transaction.atomic():
+            chat = Chat.objects.create(direct_key=key)
+
+            ChatParticipant.objects.bulk_create([
+                ChatParticipant(chat_id=chat, user_id=user1),
+                ChatParticipant(chat_id=chat, user_id=user2),
+            ])
+            membership.invalidate(chat.id)
+
+            InboxEntry.objects.bulk_create([
+                InboxEntry(user_id=user1, chat_id=chat, other_user_id=user2, last_activity_at=chat.created_at),
+                InboxEntry(user_id=user2, chat_id=chat, other_user_id=user1, last_activity_at=chat.created_at),
+            ])
+    except IntegrityError:
+        # a concurrent request created the chat first
+        return Response({
+            "chat_id": str(Chat.objects.get(direct_key=key).id),
+            "other_user_email": user2.email,
+            "created": False
+        }, status=200)
 
     return Response({
         "chat_id": str(chat.id),
@@ -346,35 +520,69 @@ def get_user_chats_detailed(request, user_id):
     except User.DoesNotExist:
         return Response({"error": "User does not exist"}, status=404)
 
-    chat_list = Chat.objects.filter(participants__user_id=user)
+    def chats_etag():
+        # the list is fully described by the user's inbox rows
+        # plus the other users' emails: updated_at for changes, the count for deletions
+        state = InboxEntry.objects.filter(user_id=user).aggregate(
+            count=Count("id"), last=Max("last_activity_at"), unread=Sum("unread_count"),
+            others=Count("other_user_id"), changed=Max("other_user_id__updated_at"),
+        )
+        return make_etag("chats", user.id, state["count"], _timestamp(state["last"]), state["unread"] or 0,
+                         state["others"], _timestamp(state["changed"]))
+
+    etag, response = not_modified(request, chats_etag)
+    if response is not None:
+        return response
+
+    # single range scan over (user_id, -last_activity_at)
+    chat_list = (
+        InboxEntry.objects
+        .filter(user_id=user)
+        .order_by("-last_activity_at")
+        .values("chat_id", "other_user_id", "other_user_id__email",
+                "last_message_preview", "last_message_at", "unread_count")
+    )
 
-    result = []
+    result = [
+        {
+            "chat_id": str(chat["chat_id"]),
+            "other_user_email": chat["other_user_id__email"] or "Unknown user",
+            "other_user_id": str(chat["other_user_id"]) if chat["other_user_id"] else None,
+            "last_message_preview": chat["last_message_preview"] or None,
+            "last_message_at": chat["last_message_at"],
+            "unread_count": chat["unread_count"],
+        }
+        for chat in chat_list
+    ]
 
-    for chat in chat_list:
-        other_participant = (
-            ChatParticipant.objects
-            .filter(chat_id=chat)
-            .exclude(user_id=user)
-            .select_related("user_id")
-            .first()
-        )
+    return Response(result, status=200, headers={"ETag": etag})
 
-        if other_participant:
-            other_user_email = other_participant.user_id.email
-            other_user_id = str(other_participant.user_id.id)
-        else:
-            other_user_email = "Unknown user"
-            other_user_id = None
 
-        result.append({
-            "chat_id": str(chat.id),
-            "other_user_email": other_user_email,
-            "other_user_id": other_user_id,
-        })
 
-    return Response(result, status=200)
+@api_view(['POST'])
+def mark_chat_read(request, chat_id):
+    # always the caller's own unread count
+    user_id = request.user.id
+
+    # unread state lives in the inbox entry only
+    if not membership.is_member(chat_id, user_id):
+        return Response({"error": "User is not a participant of this chat"}, status=404)
+    InboxEntry.objects.filter(chat_id=chat_id, user_id=user_id).update(unread_count=0)
+
+    return Response({"status": "READ"}, status=200)
 
 
+@api_view(['POST'])
+def set_typing(request, chat_id):
+    """{"typing": false} when the caller stopped typing (e.g. cleared the input), true otherwise."""
+    typing = request.data.get("typing", True)
+    if not isinstance(typing, bool):
+        return Response({"error": "typing must be true or false"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not presence.set_typing(chat_id, request.user.id, typing):
+        return Response({"error": "User is not a participant of this chat"}, status=status.HTTP_403_FORBIDDEN)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 @api_view(['POST'])
 def remove_chat_participant(request):
@@ -386,15 +594,225 @@ def remove_chat_participant(request):
 @api_view(['GET'])
 def get_messages(request, chat_id):
     try:
-        chat = Chat.objects.get(id=chat_id)
-    except Chat.DoesNotExist:
+        limit = _page_size(request, MESSAGE_PAGE_SIZE, MESSAGE_PAGE_SIZE_MAX)
+    except ValueError:
+        return Response({"error": f"limit must be between 1 and {MESSAGE_PAGE_SIZE_MAX}"}, status=400)
+
+    after = request.GET.get("after")
+    before = request.GET.get("before")
+    if after and before:
+        return Response({"error": "Use either after or before, not both"}, status=400)
+
+    def chat_etag():
+        # members' updated_at and count cover sender emails that changed or went away
+        state = next(iter(
+            Chat.objects.filter(id=chat_id)
+            .values("id", "version")
+            .annotate(members=Count("participants"), changed=Max("participants__user_id__updated_at"))
+        ), None)
+        if state is None:
+            return None
+        # one tag per page
+        return make_etag("chat", chat_id, state["version"], state["members"], _timestamp(state["changed"]),
+                         limit, after or "", before or "")
+
+    # ETag / If-None-Match, ?wait=<seconds> turns an unchanged poll into a long-poll
+    etag, response = not_modified(request, chat_etag, realtime.chat_channel(chat_id))
+    if response is not None:
+        return response
+    if etag is None:
         return Response({"error": "Chat not found"}, status=404)
 
-    messages = Message.objects.filter(chat_id=chat).order_by("sent_at")
+    if after:
+        response = get_messages_after(chat_id, after, limit)
+    else:
+        response = get_messages_before(chat_id, before, limit)
+    if response.status_code == 200:
+        response["ETag"] = etag
+    return response
+
+
+def get_messages_after(chat_id, after, limit):
+    # `after` is a sync token from a previous response or a plain message id
+    cursor = _resolve_message_cursor(chat_id, after)
+    if cursor is None:
+        return Response({"error": "Invalid after cursor"}, status=400)
+    seq, after = cursor
+
+    messages = list(
+        Message.objects
+        .filter(chat_id=chat_id, seq__gt=seq)
+        .select_related("sender_id")
+        .order_by("seq")[:limit + 1]
+    )
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    serializer = MessageSerializer(messages, many=True)
+
+    return Response({
+        "messages": serializer.data,
+        "has_more": has_more,
+        "sync_token": message_cursor(messages[-1]) if messages else after,
+    }, status=200)
+
+
+def get_messages_before(chat_id, before, limit):
+    # Newest page first, then "load older" by passing the returned `before` cursor.
+    # Seeking on seq keeps pages stable while new messages arrive.
+    messages = Message.objects.filter(chat_id=chat_id)
+    if before:
+        cursor = _resolve_message_cursor(chat_id, before)
+        if cursor is None:
+            return Response({"error": "Invalid before cursor"}, status=400)
+        seq, _ = cursor
+        messages = messages.filter(seq__lt=seq)
+
+    messages = list(
+        messages
+        .select_related("sender_id")
+        .order_by("-seq")[:limit + 1]
+    )
+    has_more = len(messages) > limit
+    messages = messages[:limit][::-1]
     serializer = MessageSerializer(messages, many=True)
 
-    return Response(serializer.data, status=200)
+    result = {
+        "messages": serializer.data,
+        "has_more": has_more,
+        "before": message_cursor(messages[0]) if messages else None,
+    }
+    if not before:
+        result["sync_token"] = message_cursor(messages[-1]) if messages else MESSAGE_CURSOR_START
+    return Response(result, status=200)
+
+
+@api_view(['GET'])
+def search_messages(request):
+    """Messages containing every word of ?q= in the caller's chats, best match first."""
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return Response({"error": "q is required"}, status=400)
+
+    try:
+        limit = _page_size(request, SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE_MAX)
+        offset = int(request.GET.get("offset", 0))
+        assert 0 <= offset <= SEARCH_MAX_OFFSET
+    except (ValueError, AssertionError):
+        return Response({
+            "error": f"limit must be between 1 and {SEARCH_PAGE_SIZE_MAX}, offset between 0 and {SEARCH_MAX_OFFSET}"
+        }, status=400)
+
+    hits = search.search_messages(request.user.id, query, limit + 1, offset)
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+
+    messages = Message.objects.select_related("sender_id").in_bulk([message_id for message_id, _ in hits])
+    results = []
+    for message_id, rank in hits:
+        if message_id not in messages:
+            continue  # deleted meanwhile
+        data = MessageSerializer(messages[message_id]).data
+        data["rank"] = rank
+        results.append(data)
+
+    return Response({
+        "results": results,
+        "has_more": has_more,
+        "next_offset": offset + limit if has_more else None,
+    }, status=200)
+
+
+def _resolve_message_cursor(chat_id, token):
+    """(seq, cursor) for a cursor, a message id or a cursor from before Message.seq; None if invalid."""
+    try:
+        return decode_message_cursor(token), token
+    except InvalidCursor:
+        pass
+
+    try:
+        message_id = decode_legacy_message_cursor(token)
+    except InvalidCursor:
+        if not _is_uuid(token):
+            return None
+        message_id = token
+    anchor = Message.objects.filter(chat_id=chat_id, id=message_id).only("id", "seq").first()
+    if anchor is None:
+        return None
+    return anchor.seq, message_cursor(anchor)
+
 
+def _timestamp(moment):
+    return moment and moment.timestamp()
+
+
+def _page_size(request, default, maximum):
+    limit = int(request.GET.get("limit", default))
+    if not 1 <= limit <= maximum:
+        raise ValueError(limit)
+    return limit
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+
+def reserve_message_seqs(counts):
+    """
+    Bump Chat.version by the number of new messages per chat ({chat_id: count})
+    and return {chat_id: first seq} for the chats that exist. Call inside a
+    transaction before inserting: the UPDATE locks the chat rows until commit,
+    so messages of a chat commit in seq order.
+    """
+    Chat.objects.filter(id__in=counts.keys()).update(version=F("version") + Case(
+        *[When(id=chat_id, then=Value(count)) for chat_id, count in counts.items()],
+        output_field=PositiveBigIntegerField(),
+    ))
+    versions = Chat.objects.filter(id__in=counts.keys()).values_list("id", "version")
+    return {chat_id: version - counts[chat_id] + 1 for chat_id, version in versions}
+
+
+def record_in_inbox(messages):
+    """
+    One UPDATE for all participants of the chat the messages (oldest first) were
+    sent to; everybody gets them as unread except for their own ones.
+    """
+    last = messages[-1]
+    sent_by = {}
+    for message in messages:
+        sent_by[message.sender_id_id] = sent_by.get(message.sender_id_id, 0) + 1
+
+    InboxEntry.objects.filter(chat_id=last.chat_id_id).update(
+        last_message_id=last.id,
+        last_message_preview=last.content[:InboxEntry.PREVIEW_LENGTH],
+        last_message_at=last.sent_at,
+        last_activity_at=last.sent_at,
+        unread_count=Case(
+            *[When(user_id=sender, then=F("unread_count") + len(messages) - count)
+              for sender, count in sent_by.items()],
+            default=F("unread_count") + len(messages)
+        )
+    )
+
+
+def replayed_message(message, chat_id, sender_id):
+    """Result for a retried send of `message`, which is already stored."""
+    if not _is_uuid(chat_id) or not _is_uuid(sender_id) or (message.chat_id_id, message.sender_id_id) != (
+        uuid.UUID(str(chat_id)), uuid.UUID(str(sender_id))
+    ):
+        return {"status": 409, "error": "id is already used by another message"}
+    return {"status": 200, "message": MessageSerializer(message).data}
+
+
+def replayed_message_response(message, chat_id, sender_id):
+    result = replayed_message(message, chat_id, sender_id)
+    if result["status"] != 200:
+        return Response({"error": result["error"]}, status=result["status"])
+    return Response(result["message"], status=200)
 
 
 @api_view(['POST'])
@@ -402,41 +820,183 @@ def send_message(request):
     sender_id = request.data.get("sender_id")
     chat_id = request.data.get("chat_id")
     content = request.data.get("content")
+    # optional, generated by the client so that retries don't create duplicates
+    message_id = request.data.get("id")
 
     if not sender_id or not chat_id or not content:
         return Response(
             {"error": "sender_id, chat_id and content are required"},
             status=400
         )
+    if not isinstance(content, str):
+        return Response({"error": "content must be a string"}, status=400)
 
-    try:
-        chat = Chat.objects.get(id=chat_id)
-    except Chat.DoesNotExist:
-        return Response({"error": "Chat not found"}, status=404)
+    if message_id is not None:
+        if not _is_uuid(message_id):
+            return Response({"error": "id must be a UUID"}, status=400)
+        message_id = uuid.UUID(str(message_id))
 
-    try:
-        sender = User.objects.get(id=sender_id)
-    except User.DoesNotExist:
-        return Response({"error": "Sender not found"}, status=404)
+        existing = Message.objects.select_related("sender_id").filter(id=message_id).first()
+        if existing:
+            return replayed_message_response(existing, chat_id, sender_id)
 
+    if not _is_uuid(chat_id):
+        return Response({"error": "Chat not found"}, status=404)
+    chat_id = uuid.UUID(str(chat_id))
 
-    if not ChatParticipant.objects.filter(chat_id=chat, user_id=sender).exists():
+    # cached, no query once the chat has been seen
+    chat_members = membership.members(chat_id)
+    if not chat_members:
+        return Response({"error": "Chat not found"}, status=404)
+
+    if not membership.is_member(chat_id, sender_id):
         return Response({"error": "User is not a participant of this chat"}, status=403)
+    sender = member_user(chat_members, sender_id)
 
-    message = Message.objects.create(
-        chat_id=chat,
-        sender_id=sender,
-        content=content
-    )
+    try:
+        with transaction.atomic():
+            seqs = reserve_message_seqs({chat_id: 1})
+            if chat_id not in seqs:
+                return Response({"error": "Chat not found"}, status=404)
+            message = Message.objects.create(
+                id=message_id or uuid.uuid4(),
+                chat_id_id=chat_id,
+                sender_id=sender,
+                content=content,
+                seq=seqs[chat_id]
+            )
+            record_in_inbox([message])
+            search.index_messages([message])
+    except IntegrityError:
+        # a concurrent retry stored it first
+        existing = message_id and Message.objects.select_related("sender_id").filter(id=message_id).first()
+        if not existing:
+            raise
+        return replayed_message_response(existing, chat_id, sender_id)
 
     serializer = MessageSerializer(message)
+    payload = {"type": "message", "message": serializer.data}
+    transaction.on_commit(lambda: realtime.publish(realtime.chat_channel(chat_id), payload))
     return Response(serializer.data, status=201)
 
 
+def member_user(chat_members, user_id):
+    # id and email from the membership cache, enough for MessageSerializer; never saved
+    user_id = str(uuid.UUID(str(user_id)))
+    return User(id=user_id, email=chat_members[user_id])
+
+
+@api_view(['POST'])
+def send_messages_batch(request):
+    """
+    Send many messages, to one or several chats, e.g. an outbox queued while
+    offline. Items are validated separately and the valid ones are stored
+    together; the result list has one entry per item, in request order.
+    """
+    items = request.data.get("messages")
+
+    if not isinstance(items, list) or not items:
+        return Response({"error": "messages must be a non-empty list"}, status=400)
+
+    if len(items) > MESSAGE_BATCH_MAX:
+        return Response({"error": f"At most {MESSAGE_BATCH_MAX} messages per request"}, status=400)
+
+    results = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("sender_id") or not item.get("chat_id") or not item.get("content"):
+            results[index] = {"status": 400, "error": "sender_id, chat_id and content are required"}
+        elif not isinstance(item["content"], str):
+            results[index] = {"status": 400, "error": "content must be a string"}
+        elif not _is_uuid(item["sender_id"]) or not _is_uuid(item["chat_id"]):
+            results[index] = {"status": 400, "error": "sender_id and chat_id must be UUIDs"}
+        elif item.get("id") is not None and not _is_uuid(item["id"]):
+            results[index] = {"status": 400, "error": "id must be a UUID"}
+        else:
+            message_id = uuid.UUID(str(item["id"])) if item.get("id") is not None else uuid.uuid4()
+            pending.append((index, message_id, uuid.UUID(str(item["chat_id"])), uuid.UUID(str(item["sender_id"])), item["content"]))
+
+    # items retried with the id of a message stored before are answered with it,
+    # repeats within the batch with whatever the first occurrence got
+    stored = Message.objects.select_related("sender_id").in_bulk({message_id for _, message_id, _, _, _ in pending})
+    first_index = {}
+    repeats = []
+    new = []
+    for index, message_id, chat_id, sender_id, content in pending:
+        if message_id in stored:
+            results[index] = replayed_message(stored[message_id], chat_id, sender_id)
+        elif message_id in first_index:
+            repeats.append((index, message_id, first_index[message_id], chat_id, sender_id))
+        else:
+            first_index[message_id] = index
+            new.append((index, message_id, chat_id, sender_id, content))
+
+    # member lists of all chats in the batch, one query for those not cached
+    members = membership.members_of({chat_id for _, _, chat_id, _, _ in new})
+
+    messages = []
+    for index, message_id, chat_id, sender_id, content in new:
+        chat_members = members[str(chat_id)]
+        if not chat_members:
+            results[index] = {"status": 404, "error": "Chat not found"}
+            continue
+        if str(sender_id) not in chat_members:
+            results[index] = {"status": 403, "error": "User is not a participant of this chat"}
+            continue
+        sender = member_user(chat_members, sender_id)
+        messages.append((index, Message(id=message_id, chat_id_id=chat_id, sender_id=sender, content=content)))
+
+    if messages:
+        try:
+            with transaction.atomic():
+                by_chat = {}
+                for _, message in messages:
+                    by_chat.setdefault(message.chat_id_id, []).append(message)
+                seqs = reserve_message_seqs({chat_id: len(chat_messages) for chat_id, chat_messages in by_chat.items()})
+
+                # chats deleted since their members were read
+                for index, message in messages:
+                    if message.chat_id_id not in seqs:
+                        results[index] = {"status": 404, "error": "Chat not found"}
+                messages = [(index, message) for index, message in messages if message.chat_id_id in seqs]
+                for chat_id, first_seq in seqs.items():
+                    for offset, message in enumerate(by_chat[chat_id]):
+                        message.seq = first_seq + offset
+
+                Message.objects.bulk_create([message for _, message in messages])
+                for chat_id in seqs:
+                    record_in_inbox(by_chat[chat_id])
+                search.index_messages([message for _, message in messages])
+        except IntegrityError:
+            # a concurrent retry stored some of the ids first; nothing from this
+            # request was written, sending it again replays those
+            return Response({"error": "Some messages were stored by another request, send the batch again"}, status=409)
+
+        for index, message in messages:
+            data = MessageSerializer(message).data
+            results[index] = {"status": 201, "message": data}
+            stored[message.id] = message
+            payload = {"type": "message", "message": data}
+            transaction.on_commit(
+                lambda channel=realtime.chat_channel(message.chat_id_id), payload=payload: realtime.publish(channel, payload)
+            )
+
+    for index, message_id, first, chat_id, sender_id in repeats:
+        if message_id in stored:
+            results[index] = replayed_message(stored[message_id], chat_id, sender_id)
+        else:
+            results[index] = results[first]
+
+    return Response({"results": results}, status=200)
+
+
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Game, User
+from .models import Game, GameMove, User
+from .serializers import GameStateSerializer
+from . import bitboard, engine, solver
+from django.contrib.auth.hashers import make_password
 
 
 @api_view(['POST'])
@@ -447,32 +1007,89 @@ def create_game(request):
     if not player_1_id or not player_2_id:
         return Response({"error": "player_1_id and player_2_id are required"}, status=400)
 
-    try:
-        p1 = User.objects.get(id=player_1_id)
-        p2 = User.objects.get(id=player_2_id)
-    except User.DoesNotExist:
+    if player_1_id == player_2_id:
+        return Response({"error": "Cannot create game with the same user twice"}, status=400)
+
+    players = User.objects.in_bulk([player_1_id, player_2_id])
+    if len(players) != 2:
         return Response({"error": "One of the players does not exist"}, status=404)
+    p1, p2 = players[uuid.UUID(str(player_1_id))], players[uuid.UUID(str(player_2_id))]
 
+    board_size, win_length, error = board_variant(request.data, engine.CLASSIC_SIZE, engine.CLASSIC_SIZE)
+    if error:
+        return Response({"error": error}, status=400)
 
-    existing = (
-        Game.objects.filter(player_1_id=p1, player_2_id=p2).first() or
-        Game.objects.filter(player_1_id=p2, player_2_id=p1).first()
-    )
+    # a game with the server account is the same game create-vs-server starts
+    if p1.email == settings.GAME_SERVER_PLAYER_EMAIL:
+        p1, p2 = p2, p1
+    if p2.email == settings.GAME_SERVER_PLAYER_EMAIL:
+        if not engine.is_classic(board_size, win_length):
+            return Response({"error": "The server only plays on the 3x3 board"}, status=400)
+        return start_game(p1, p2, board_size, win_length, vs_server=True)
+
+    return start_game(p1, p2, board_size, win_length)
+
+
+@api_view(['POST'])
+def create_game_vs_server(request):
+    player_id = request.data.get("player_id")
+
+    if not player_id:
+        return Response({"error": "player_id is required"}, status=400)
+
+    player = User.objects.filter(id=player_id).first()
+    if not player:
+        return Response({"error": "Player does not exist"}, status=404)
+
+    server = get_server_player()
+    if player.id == server.id:
+        return Response({"error": "Cannot create game with the same user twice"}, status=400)
+
+    # the solver only knows the classic board
+    return start_game(player, server, engine.CLASSIC_SIZE, engine.CLASSIC_SIZE, vs_server=True)
+
+
+def board_variant(data, board_size, win_length):
+    """board_size and win_length from the request, defaulting to the given ones; (size, k, error)."""
+    try:
+        board_size = int(data.get("board_size", board_size))
+        win_length = int(data.get("win_length", win_length))
+    except (TypeError, ValueError):
+        return None, None, "board_size and win_length must be numbers"
+    return board_size, win_length, engine.validate(board_size, win_length)
+
+
+def start_game(p1, p2, board_size, win_length, vs_server=False):
+    key = pair_key(p1.id, p2.id)
+    existing = Game.objects.filter(players_key=key).values_list("id", flat=True).first()
 
     if existing:
         return Response({
             "message": "Game already exists",
-            "game_id": existing.id
+            "game_id": existing
         }, status=200)
 
-
-    game = Game.objects.create(
-        player_1_id=p1,
-        player_2_id=p2,
-        player_1_symbol='X',
-        player_2_symbol='O',
-        current_turn=p1
-    )
+    try:
+        with transaction.atomic():
+            game = Game.objects.create(
+                player_1_id=p1,
+                player_2_id=p2,
+                players_key=key,
+                vs_server=vs_server,
+                player_1_symbol='X',
+                player_2_symbol='O',
+                current_turn=p1,
+                board_size=board_size,
+                win_length=win_length,
+                cells=None if engine.is_classic(board_size, win_length) else engine.new_board(board_size),
+            )
+            play_server_turn(game)
+    except IntegrityError:
+        # a concurrent request created the game first
+        return Response({
+            "message": "Game already exists",
+            "game_id": Game.objects.get(players_key=key).id
+        }, status=200)
 
     return Response({
         "game_id": game.id,
@@ -480,6 +1097,29 @@ def create_game(request):
         "player_2": p2.email,
     }, status=201)
 
+
+def get_server_player():
+    """The user the server plays as; created on first use, nobody can log in as it."""
+    player, _ = User.objects.get_or_create(
+        email=settings.GAME_SERVER_PLAYER_EMAIL,
+        defaults={"hashed_password": make_password(None)},
+    )
+    return player
+
+
+def play_server_turn(game):
+    """Answer with the solver's move if the server player is on turn, returns the field or None."""
+    if not game.vs_server or game.is_finished or game.cells is not None:
+        return None
+    if game.current_turn_id != game.player_2_id_id:
+        return None
+
+    field = solver.best_move(game.board_bits)
+    if not play_move(game, game.current_turn_id, field):
+        return None
+    return field
+
+
 @api_view(['GET'])
 def get_game(request):
     p1 = request.GET.get("player_1_id")
@@ -487,48 +1127,34 @@ def get_game(request):
 
     if not p1 or not p2:
         return Response({"error": "player_1_id and player_2_id are required"}, status=400)
+    if not _is_uuid(p1) or not _is_uuid(p2):
+        return Response({"error": "Game not found"}, status=404)
 
-
-    game = Game.objects.filter(player_1_id=p1, player_2_id=p2).first()
-    if not game:
-        game = Game.objects.filter(player_1_id=p2, player_2_id=p1).first()
+    game = Game.objects.filter(players_key=pair_key(uuid.UUID(p1), uuid.UUID(p2))).first()
 
     if not game:
         return Response({"error": "Game not found"}, status=404)
 
-    fields = {f"field_{i}": getattr(game, f"field_{i}") for i in range(1, 10)}
+    def game_etag():
+        version = Game.objects.filter(id=game.id).values_list("version", flat=True).first()
+        return None if version is None else make_etag("game", game.id, version)
 
-    return Response({
-        "game_id": game.id,
-        "player_1": str(game.player_1_id.id),
-        "player_2": str(game.player_2_id.id),
-        "player_1_symbol": game.player_1_symbol,
-        "player_2_symbol": game.player_2_symbol,
-        "current_turn": str(game.current_turn.id),
-        "is_finished": game.is_finished,
-        "winner": str(game.winner.id) if game.winner else None,
-        "board": fields
-    })
-
-
-
-def check_winner(game):
-    board = [getattr(game, f"field_{i}") for i in range(1, 10)]
-
-    wins = [
-        (0,1,2), (3,4,5), (6,7,8),  # poziomo
-        (0,3,6), (1,4,7), (2,5,8),  # pionowo
-        (0,4,8), (2,4,6)            # na skos
-    ]
+    loaded_etag = make_etag("game", game.id, game.version)
+    etag, response = not_modified(request, game_etag, realtime.game_channel(game.id), etag=loaded_etag)
+    if response is not None:
+        return response
+    if etag is None:
+        return Response({"error": "Game not found"}, status=404)
 
-    for a, b, c in wins:
-        if board[a] == board[b] == board[c] and board[a] != "EMPTY":
-            return board[a]
+    if etag != loaded_etag:
+        # changed while the request was parked
+        game = Game.objects.get(id=game.id)
+    return Response(GameStateSerializer(game).data, headers={"ETag": make_etag("game", game.id, game.version)})
 
-    if "EMPTY" not in board:
-        return "DRAW"
 
-    return None
+def publish_game_state(game):
+    payload = {"type": "game", "game": GameStateSerializer(game).data}
+    transaction.on_commit(lambda: realtime.publish(realtime.game_channel(game.id), payload))
 
 
 
@@ -546,69 +1172,127 @@ def make_move(request):
     except Game.DoesNotExist:
         return Response({"error": "Game not found"}, status=404)
 
+    try:
+        field = int(field)
+        assert 1 <= field <= game.board_size ** 2
+    except:
+        return Response({"error": f"Field must be 1-{game.board_size ** 2}"}, status=400)
+
     if game.is_finished:
         return Response({"error": "Game is already finished"}, status=400)
 
-    if str(game.current_turn.id) != str(player_id):
+    if str(game.current_turn_id) != str(player_id):
         return Response({"error": "Not your turn"}, status=403)
 
+    if board_symbol_at(game, field) != bitboard.EMPTY:
+        return Response({"error": "Field already taken"}, status=400)
 
-    try:
-        field = int(field)
-        assert 1 <= field <= 9
-    except:
-        return Response({"error": "Field must be 1-9"}, status=400)
 
-    field_name = f"field_{field}"
+    with transaction.atomic():
+        if not play_move(game, player_id, field):
+            return Response({"error": "Game changed in the meantime, reload and try again"}, status=409)
+        server_move = play_server_turn(game)
 
+    extra = {} if server_move is None else {"server_move": server_move}
 
-    if getattr(game, field_name) != "EMPTY":
-        return Response({"error": "Field already taken"}, status=400)
+    if game.is_finished and game.winner_id is not None:
+        return Response({
+            "status": "WIN",
+            "winner": game.player_1_symbol if game.winner_id == game.player_1_id_id else game.player_2_symbol,
+            "winner_user_id": str(game.winner_id),
+            **extra
+        })
 
+    elif game.is_finished:
+        return Response({"status": "DRAW", **extra})
 
-    if str(game.player_1_id.id) == str(player_id):
+    return Response({
+        "status": "OK",
+        "next_turn": str(game.current_turn_id),
+        **extra
+    })
+
+
+def play_move(game, player_id, field):
+    """
+    Put the player's symbol on an empty field of `game` (already validated), log the
+    move and settle the round if it ended. Call inside a transaction; returns False
+    if the game was changed concurrently.
+    """
+    if str(game.player_1_id_id) == str(player_id):
         symbol = game.player_1_symbol
-        next_turn = game.player_2_id
+        next_turn_id = game.player_2_id_id
     else:
         symbol = game.player_2_symbol
-        next_turn = game.player_1_id
+        next_turn_id = game.player_1_id_id
 
+    changes, winner_symbol = place_symbol(game, field, symbol)
+    changes["move_count"] = game.move_count + 1
+    changes["version"] = game.version + 1
+    changes["updated_at"] = timezone.now()
 
-    setattr(game, field_name, symbol)
-    game.save()
+    # the counters are safe to compute from the row read above, the version
+    # check in save_game_changes rejects the update if it changed since
+    if winner_symbol == "X" or winner_symbol == "O":
+        changes["is_finished"] = True
+        if game.player_1_symbol == winner_symbol:
+            changes["winner_id"] = game.player_1_id_id
+            changes["player_1_wins"] = game.player_1_wins + 1
+        else:
+            changes["winner_id"] = game.player_2_id_id
+            changes["player_2_wins"] = game.player_2_wins + 1
+    elif winner_symbol == "DRAW":
+        changes["is_finished"] = True
+        changes["winner_id"] = None
+        changes["draws"] = game.draws + 1
+    else:
+        changes["current_turn_id"] = next_turn_id
 
+    if not save_game_changes(game, changes):
+        return False
 
-    winner_symbol = check_winner(game)
+    GameMove.objects.create(
+        game_id_id=game.id,
+        round=game.round,
+        move_index=game.move_count,
+        field=field,
+        player_id_id=player_id,
+    )
+    return True
 
-    if winner_symbol == "X" or winner_symbol == "O":
-        game.is_finished = True
 
-        game.winner = (
-            game.player_1_id if game.player_1_symbol == winner_symbol else game.player_2_id
-        )
-        game.save()
+def board_symbol_at(game, field):
+    if game.cells is None:
+        return bitboard.symbol_at(game.board_bits, field)
+    return engine.symbol_at(game.cells, field)
 
-        return Response({
-            "status": "WIN",
-            "winner": winner_symbol,
-            "winner_user_id": str(game.winner.id)
-        })
 
-    elif winner_symbol == "DRAW":
-        game.is_finished = True
-        game.winner = None
-        game.save()
+def place_symbol(game, field, symbol):
+    """Board changes for putting `symbol` on `field`, and the winner after it ("X", "O", "DRAW" or None)."""
+    if game.cells is None:
+        board_bits = bitboard.place(game.board_bits, field, symbol)
+        return {"board_bits": board_bits}, bitboard.winner(board_bits)
 
-        return Response({"status": "DRAW"})
+    # only the lines through the new cell are checked
+    cells = engine.place(game.cells, field, symbol)
+    return {"cells": cells}, engine.winner_after(cells, game.board_size, game.win_length, field, game.move_count + 1)
 
 
-    game.current_turn = next_turn
-    game.save()
+def save_game_changes(game, changes):
+    """
+    Write `changes` in one UPDATE that only matches if nobody else changed the game
+    since it was read (same version), then apply them to `game` and push the new
+    state. Returns False on a conflicting concurrent change.
+    """
+    updated = Game.objects.filter(id=game.id, version=game.version).update(**changes)
+    if not updated:
+        return False
+
+    for name, value in changes.items():
+        setattr(game, name, value)
+    publish_game_state(game)
+    return True
 
-    return Response({
-        "status": "OK",
-        "next_turn": str(next_turn.id)
-    })
 
 @api_view(["POST"])
 def restart_game(request):
@@ -623,13 +1307,125 @@ def restart_game(request):
         return Response({"error": "Game not found"}, status=404)
 
 
-    for i in range(1, 10):
-        setattr(game, f"field_{i}", "EMPTY")
-
-    game.is_finished = False
-    game.winner = None
-    game.current_turn = game.player_1_id   #X zawsze zaczyna
+    board_size, win_length, error = board_variant(request.data, game.board_size, game.win_length)
+    if error:
+        return Response({"error": error}, status=400)
+
+    classic = engine.is_classic(board_size, win_length)
+    if not classic and game.vs_server:
+        return Response({"error": "The server only plays on the 3x3 board"}, status=400)
+
+    changes = {
+        "board_size": board_size,
+        "win_length": win_length,
+        "board_bits": 0,
+        "cells": None if classic else engine.new_board(board_size),
+        "move_count": 0,
+        "is_finished": False,
+        "winner_id": None,
+        "current_turn_id": game.player_1_id_id,   #X zawsze zaczyna
+        "round": game.round + 1,
+        "version": game.version + 1,
+        "updated_at": timezone.now(),
+    }
 
-    game.save()
+    with transaction.atomic():
+        if not save_game_changes(game, changes):
+            return Response({"error": "Game changed in the meantime, reload and try again"}, status=409)
+        play_server_turn(game)
 
     return Response({"status": "RESTARTED"})
+
+
+@api_view(["GET"])
+def get_game_moves(request):
+    game_id = request.GET.get("game_id")
+    round_number = request.GET.get("round")
+
+    if not game_id or not _is_uuid(game_id):
+        return Response({"error": "game_id is required"}, status=400)
+
+    game = Game.objects.filter(id=game_id).values("round").first()
+    if game is None:
+        return Response({"error": "Game not found"}, status=404)
+
+    if round_number is None:
+        round_number = game["round"]
+    else:
+        try:
+            round_number = int(round_number)
+            assert 1 <= round_number <= game["round"]
+        except (ValueError, AssertionError):
+            return Response({"error": f"round must be 1-{game['round']}"}, status=400)
+
+    moves = GameMove.objects.filter(game_id=game_id, round=round_number).order_by("move_index").values(
+        "move_index", "field", "player_id", "created_at"
+    )
+
+    return Response({
+        "game_id": game_id,
+        "round": round_number,
+        "moves": [
+            {
+                "move_index": move["move_index"],
+                "field": move["field"],
+                "player": str(move["player_id"]),
+                "created_at": move["created_at"],
+            }
+            for move in moves
+        ],
+    })
+
+
+@api_view(["GET"])
+def get_game_stats(request):
+    p1 = request.GET.get("player_1_id")
+    p2 = request.GET.get("player_2_id")
+
+    if not p1 or not p2:
+        return Response({"error": "player_1_id and player_2_id are required"}, status=400)
+
+    if not _is_uuid(p1) or not _is_uuid(p2):
+        return Response({"error": "Game not found"}, status=404)
+
+    game = Game.objects.filter(players_key=pair_key(uuid.UUID(p1), uuid.UUID(p2))).values(
+        "id", "player_1_id", "player_2_id", "player_1_wins", "player_2_wins", "draws"
+    ).first()
+
+    if not game:
+        return Response({"error": "Game not found"}, status=404)
+
+    return Response({
+        "game_id": str(game["id"]),
+        "rounds_finished": game["player_1_wins"] + game["player_2_wins"] + game["draws"],
+        "wins": {
+            str(game["player_1_id"]): game["player_1_wins"],
+            str(game["player_2_id"]): game["player_2_wins"],
+        },
+        "draws": game["draws"],
+    })
+
+
+@api_view(["GET"])
+def get_game_hint(request):
+    game_id = request.GET.get("game_id")
+
+    if not game_id or not _is_uuid(game_id):
+        return Response({"error": "game_id is required"}, status=400)
+
+    game = Game.objects.filter(id=game_id).values("board_bits", "cells", "is_finished", "current_turn_id").first()
+    if game is None:
+        return Response({"error": "Game not found"}, status=404)
+
+    if game["is_finished"]:
+        return Response({"error": "Game is already finished"}, status=400)
+
+    if game["cells"] is not None:
+        return Response({"error": "Hints are only available on the 3x3 board"}, status=400)
+
+    # table lookup, no search at request time
+    return Response({
+        "player": str(game["current_turn_id"]),
+        "field": solver.best_move(game["board_bits"]),
+        "outcome": solver.outcome(game["board_bits"]),
+    })
@@ -80,6 +80,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
 
 
 # Database
@@ -116,6 +117,23 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing (api/hashers.py). The first hasher is used for new
+# passwords, the others only verify older hashes and get upgraded on login.
+# Size auth workers with: python manage.py bench_password_hasher
+PASSWORD_HASHERS = [
+    'api.hashers.TunablePBKDF2PasswordHasher',
+    'api.hashers.UnsaltedSHA256PasswordHasher',
+]
+
+# PBKDF2-SHA256 work factor (OWASP recommends at least 600 000)
+PASSWORD_HASH_ITERATIONS = config('PASSWORD_HASH_ITERATIONS', default=600000, cast=int)
+
+# Hashing runs on a bounded thread pool: this many hashes at once, this many
+# more waiting, anything beyond gets 429 so chat/game requests keep their workers
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=2, cast=int)
+PASSWORD_HASH_QUEUE_SIZE = config('PASSWORD_HASH_QUEUE_SIZE', default=8, cast=int)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -146,8 +164,34 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.JWTAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+    'EXCEPTION_HANDLER': 'api.exceptions.exception_handler',
 }
 
+# Verified JWTs kept in memory (per process) until they expire
+AUTH_TOKEN_CACHE_SIZE = config('AUTH_TOKEN_CACHE_SIZE', default=10000, cast=int)
+
+# Chat member lists (api/membership.py). Kept per process unless
+# CHAT_MEMBERSHIP_CACHE_ALIAS names an entry of CACHES shared by all processes;
+# with several processes and no shared cache, TTL bounds how long a removed or
+# added participant can go unnoticed by the other ones.
+CHAT_MEMBERSHIP_CACHE_ALIAS = config('CHAT_MEMBERSHIP_CACHE_ALIAS', default='')
+CHAT_MEMBERSHIP_CACHE_SIZE = config('CHAT_MEMBERSHIP_CACHE_SIZE', default=10000, cast=int)
+CHAT_MEMBERSHIP_CACHE_TTL = config('CHAT_MEMBERSHIP_CACHE_TTL', default=60, cast=int)
+
+# Online status and typing (api/presence.py), never written to the database.
+# Kept per process unless PRESENCE_CACHE_ALIAS names a shared entry of CACHES,
+# which is needed as soon as there is more than one server process. A user is
+# online for PRESENCE_TIMEOUT seconds after their last heartbeat.
+PRESENCE_CACHE_ALIAS = config('PRESENCE_CACHE_ALIAS', default='')
+PRESENCE_CACHE_SIZE = config('PRESENCE_CACHE_SIZE', default=100000, cast=int)
+PRESENCE_TIMEOUT = config('PRESENCE_TIMEOUT', default=60, cast=int)
+
 # Swagger/OpenAPI Configuration
 SPECTACULAR_SETTINGS = {
     'TITLE': 'PIM API',
@@ -155,3 +199,12 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
 }
+
+# Real-time push (WebSocket endpoints in api/realtime.py).
+# LocalBroker fans out within one process; point this at a shared broker
+# implementation when running several server processes.
+PUSH_BROKER = config('PUSH_BROKER', default='api.realtime.LocalBroker')
+
+# Account the server plays "play against the server" games as (api/solver.py);
+# created on first use without a usable password
+GAME_SERVER_PLAYER_EMAIL = config('GAME_SERVER_PLAYER_EMAIL', default='server-player@pim.local')
@@ -21,6 +21,14 @@ type Message = {
     sent_at: string;
 };
 
+// Adds a page to the list, skipping messages that are already shown
+const mergeMessages = (current: Message[], page: Message[], atStart: boolean) => {
+    const known = new Set(current.map(m => m.id));
+    const fresh = page.filter(m => !known.has(m.id));
+    if (fresh.length === 0) return current;
+    return atStart ? [...fresh, ...current] : [...current, ...fresh];
+};
+
 const ChatScreen = ({ route }: any) => {
     const { chatId, otherUserEmail } = route.params;
 
@@ -65,10 +73,27 @@ const ChatScreen = ({ route }: any) => {
 
 
 
+    const syncToken = useRef<string | null>(null);
+    const olderCursor = useRef<string | null>(null);
+    const [hasOlder, setHasOlder] = useState(false);
+    // one request per loader at a time; a poll asked for meanwhile runs right after
+    const loadingNewer = useRef(false);
+    const pollAgain = useRef(false);
+    const loadingOlder = useRef(false);
+
     const loadMessages = useCallback(async () => {
+        if (loadingNewer.current) {
+            pollAgain.current = true;
+            return;
+        }
+        loadingNewer.current = true;
+
         try {
             const token = await AsyncStorage.getItem("token");
-            const response = await fetch(`${API_URL}/messages/${chatId}/`, {
+            const query = syncToken.current
+                ? `?after=${encodeURIComponent(syncToken.current)}`
+                : "";
+            const response = await fetch(`${API_URL}/messages/${chatId}/${query}`, {
                 method: "GET",
                 headers: {
                     "Authorization": "Bearer " + token
@@ -78,18 +103,67 @@ const ChatScreen = ({ route }: any) => {
             const data = await response.json();
 
             if (response.ok) {
-                setMessages(data);
-                scrollToBottom();
+                if (!syncToken.current) {
+                    olderCursor.current = data.before;
+                    setHasOlder(data.has_more);
+                    setMessages(data.messages);
+                    scrollToBottom();
+                } else if (data.messages.length > 0) {
+                    setMessages(prev => mergeMessages(prev, data.messages, false));
+                    scrollToBottom();
+                }
+                syncToken.current = data.sync_token;
             } else {
                 console.log("Error loading messages:", data);
             }
 
         } catch {
             console.log("Connection error loading messages.");
+        } finally {
+            loadingNewer.current = false;
+        }
+
+        if (pollAgain.current) {
+            pollAgain.current = false;
+            loadMessages();
         }
     }, [chatId]);
 
 
+    const loadOlderMessages = async () => {
+        if (!hasOlder || !olderCursor.current || loadingOlder.current) return;
+        loadingOlder.current = true;
+
+        try {
+            const token = await AsyncStorage.getItem("token");
+            const response = await fetch(
+                `${API_URL}/messages/${chatId}/?before=${encodeURIComponent(olderCursor.current)}`,
+                {
+                    method: "GET",
+                    headers: {
+                        "Authorization": "Bearer " + token
+                    }
+                }
+            );
+
+            const data = await response.json();
+
+            if (response.ok) {
+                olderCursor.current = data.before;
+                setHasOlder(data.has_more);
+                setMessages(prev => mergeMessages(prev, data.messages, true));
+            } else {
+                console.log("Error loading older messages:", data);
+            }
+
+        } catch {
+            console.log("Connection error loading older messages.");
+        } finally {
+            loadingOlder.current = false;
+        }
+    };
+
+
     useEffect(() => {
         loadMessages();
         const interval = setInterval(loadMessages, 1500);
@@ -166,6 +240,7 @@ const ChatScreen = ({ route }: any) => {
                 keyExtractor={(item) => item.id}
                 contentContainerStyle={styles.messageList}
                 onContentSizeChange={scrollToBottom}
+                onStartReached={loadOlderMessages}
             />
 
             <View style={styles.inputContainer}>
@@ -75,15 +75,29 @@ const HomeScreen = ({navigation}: any) => {
     try {
       const token = await AsyncStorage.getItem('token');
 
-      const response = await fetch(`${API_URL}/contacts/list/`, {
-        method: 'GET',
-        headers: {Authorization: 'Bearer ' + token},
-      });
-
-      const data = await response.json();
-
-      if (response.ok) setContacts(data.contacts);
-      else console.log('Error loading contacts:', data);
+      // the list comes in pages, follow next_cursor until the last one
+      const all: any = [];
+      let cursor: string | null = null;
+      do {
+        const query: string = cursor
+          ? `?cursor=${encodeURIComponent(cursor)}`
+          : '';
+        const response = await fetch(`${API_URL}/contacts/list/${query}`, {
+          method: 'GET',
+          headers: {Authorization: 'Bearer ' + token},
+        });
+
+        const data = await response.json();
+
+        if (!response.ok) {
+          console.log('Error loading contacts:', data);
+          return;
+        }
+        all.push(...data.contacts);
+        cursor = data.next_cursor;
+      } while (cursor);
+
+      setContacts(all);
     } catch (err) {
       console.log('Connection error loading contacts.');
     }